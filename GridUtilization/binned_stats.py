@@ -0,0 +1,115 @@
+"""
+Binned conditional statistics for the price-vs-driver scatter charts
+
+For x/y arrays (e.g. load vs A/S price) computes, per x bin, the count,
+median and P10/P90 of y. All groups (years) and bins are done in one pass:
+points are keyed by group * n_bins + bin, sorted once with np.lexsort on
+(y, key), and every percentile is read from the sorted array by index
+arithmetic (linear interpolation, same as np.percentile).
+
+Used by the plot_*_by_year.py scripts to draw a median line and P10-P90 band
+per year, and to export the bands as JSON.
+"""
+import json
+
+import numpy as np
+
+PERCENTILES = (10, 50, 90)
+# Bins with fewer points get no statistics (NaN)
+MIN_COUNT = 20
+
+
+def grouped_binned_stats(x, y, groups, n_groups, edges, percentiles=PERCENTILES,
+                         min_count=MIN_COUNT):
+    """Per (group, bin) count and percentiles of y
+
+    x, y, groups: equal-length arrays; groups are ints in [0, n_groups).
+    Points with x outside [edges[0], edges[-1]] or non-finite x/y are dropped.
+    Returns {"count": (n_groups, n_bins) ints, "p10": ..., "p50": ..., ...}.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    groups = np.asarray(groups, dtype=np.int64)
+    n_bins = len(edges) - 1
+
+    bins = np.searchsorted(edges, x, side="right") - 1
+    bins[x == edges[-1]] = n_bins - 1  # Right edge belongs to the last bin
+    keep = (bins >= 0) & (bins < n_bins) & np.isfinite(x) & np.isfinite(y)
+    keys = groups[keep] * n_bins + bins[keep]
+    values = y[keep]
+
+    order = np.lexsort((values, keys))
+    values = values[order]
+    count = np.bincount(keys, minlength=n_groups * n_bins)
+    start = np.concatenate(([0], np.cumsum(count)[:-1]))
+
+    stats = {"count": count.reshape(n_groups, n_bins)}
+    valid = count >= max(min_count, 1)
+    for p in percentiles:
+        result = np.full(n_groups * n_bins, np.nan)
+        pos = start[valid] + (count[valid] - 1) * (p / 100.0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, start[valid] + count[valid] - 1)
+        frac = pos - lo
+        result[valid] = values[lo] * (1 - frac) + values[hi] * frac
+        stats[f"p{p}"] = result.reshape(n_groups, n_bins)
+    return stats
+
+
+def binned_stats(x, y, edges, percentiles=PERCENTILES, min_count=MIN_COUNT):
+    """Per-bin count and percentiles of y for a single group"""
+    stats = grouped_binned_stats(x, y, np.zeros(len(x), dtype=np.int64), 1, edges,
+                                 percentiles, min_count)
+    return {key: value[0] for key, value in stats.items()}
+
+
+def yearly_binned_stats(data_by_year, x_key, y_key, edges, min_count=MIN_COUNT):
+    """{year: stats} from the {year: {key: values}} dicts of the plot scripts"""
+    years = sorted(data_by_year)
+    x = np.concatenate([np.asarray(data_by_year[yr][x_key], dtype=float) for yr in years])
+    y = np.concatenate([np.asarray(data_by_year[yr][y_key], dtype=float) for yr in years])
+    groups = np.repeat(np.arange(len(years)), [len(data_by_year[yr][x_key]) for yr in years])
+    stats = grouped_binned_stats(x, y, groups, len(years), edges, min_count=min_count)
+    return {yr: {key: value[i] for key, value in stats.items()} for i, yr in enumerate(years)}
+
+
+def bin_centers(edges):
+    edges = np.asarray(edges, dtype=float)
+    return (edges[:-1] + edges[1:]) / 2
+
+
+def draw_band(ax, edges, stats, color, alpha=0.25, linewidth=2.0):
+    """Median line and P10-P90 band on ax (bins without statistics are gaps)"""
+    centers = bin_centers(edges)
+    ax.fill_between(centers, stats["p10"], stats["p90"], color=color, alpha=alpha,
+                    linewidth=0, zorder=3)
+    # Error bars keep isolated bins (no neighbour to fill towards) visible
+    ax.errorbar(centers, stats["p50"],
+                yerr=[stats["p50"] - stats["p10"], stats["p90"] - stats["p50"]],
+                fmt="none", ecolor=color, elinewidth=linewidth * 0.5, alpha=0.6, zorder=4)
+    ax.plot(centers, stats["p50"], color=color, linewidth=linewidth,
+            marker="o", markersize=linewidth * 1.5, zorder=5)
+
+
+def _rounded(values, digits):
+    return [None if not np.isfinite(v) else round(float(v), digits) for v in values]
+
+
+def bands_to_dict(edges, stats_by_year, digits=2):
+    """JSON-ready {"edges", "centers", "years": {year: {count, p10, p50, p90}}}"""
+    return {
+        "edges": _rounded(edges, 3),
+        "centers": _rounded(bin_centers(edges), 3),
+        "years": {
+            str(year): {key: (value.astype(int).tolist() if key == "count"
+                              else _rounded(value, digits))
+                        for key, value in stats.items()}
+            for year, stats in stats_by_year.items()
+        },
+    }
+
+
+def save_bands(path, bands):
+    """Write {series: bands_to_dict(...)} as compact JSON"""
+    with open(path, "w") as f:
+        json.dump(bands, f, separators=(",", ":"))
@@ -0,0 +1,94 @@
+"""
+Reproducible chart output and pixel-level change detection
+
+save_image() writes composed chart images (see panel_cache.py) as PNGs with
+fixed metadata (a constant Software tag, no creation time) and a fixed dpi,
+so re-rendering unchanged data produces identical files.
+
+changed_charts() compares each PNG against its committed version by a hash
+of the decoded pixels, so charts that only differ in encoding are not staged
+again. Run as a script to restore pixel-identical charts in the working tree
+before a blanket `git add`:
+
+    python chart_output.py --restore-unchanged
+"""
+import os
+import io
+import sys
+import glob
+import hashlib
+import subprocess
+
+CHART_DPI = 200
+CHART_METADATA = {
+    "Software": "eshan-website charts",
+    "Creation Time": None,
+}
+
+
+def save_image(path, image, dpi=CHART_DPI):
+    """Save a PIL image as a reproducible PNG"""
+    from PIL import PngImagePlugin
+
+    info = PngImagePlugin.PngInfo()
+    for key, value in CHART_METADATA.items():
+        if value is not None:
+            info.add_text(key, value)
+    image.save(path, pnginfo=info, dpi=(dpi, dpi))
+
+
+def pixel_hash(data):
+    """SHA-256 of the decoded RGBA pixels of PNG bytes (or a file path)"""
+    from PIL import Image
+
+    source = io.BytesIO(data) if isinstance(data, bytes) else data
+    with Image.open(source) as img:
+        rgba = img.convert("RGBA")
+        digest = hashlib.sha256(f"{rgba.size[0]}x{rgba.size[1]}".encode())
+        digest.update(rgba.tobytes())
+    return digest.hexdigest()
+
+
+def committed_bytes(path, rev="HEAD"):
+    """Bytes of path at rev, or None if it is not tracked there"""
+    rel = os.path.relpath(os.path.abspath(path), repo_root()).replace(os.sep, "/")
+    result = subprocess.run(["git", "show", f"{rev}:{rel}"], capture_output=True)
+    return result.stdout if result.returncode == 0 else None
+
+
+def repo_root():
+    result = subprocess.run(["git", "rev-parse", "--show-toplevel"],
+                            capture_output=True, text=True)
+    return result.stdout.strip() or os.getcwd()
+
+
+def changed_charts(paths):
+    """Split PNG paths into (changed, unchanged) against the committed version"""
+    changed, unchanged = [], []
+    for path in paths:
+        old = committed_bytes(path)
+        if old is None:
+            changed.append(path)
+            continue
+        with open(path, "rb") as f:
+            new = f.read()
+        try:
+            same = new == old or pixel_hash(new) == pixel_hash(old)
+        except Exception:
+            same = False
+        (unchanged if same else changed).append(path)
+    return changed, unchanged
+
+
+def restore_unchanged(paths):
+    """Check out the committed bytes of pixel-identical charts; return changed paths"""
+    changed, unchanged = changed_charts(paths)
+    if unchanged:
+        subprocess.run(["git", "checkout", "--"] + unchanged, capture_output=True)
+    return changed
+
+
+if __name__ == "__main__":
+    if "--restore-unchanged" in sys.argv:
+        changed = restore_unchanged(sorted(glob.glob("*.png")))
+        print(f"{len(changed)} chart(s) changed: {', '.join(changed) or 'none'}")
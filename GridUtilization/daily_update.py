@@ -0,0 +1,1047 @@
+"""
+CAISO Daily Data Update Script
+
+Automatically updates all CAISO data, recalculates metrics, regenerates charts,
+and pushes to GitHub. Handles missing dates if script wasn't run for multiple days.
+
+Run this daily to keep website updated with latest data.
+
+--stream pipelines a multi-day backfill: each day is validated and ingested as
+soon as its files land, while the next days download; the full-history
+rollups and charts run once at the end.
+"""
+import os
+import sys
+import csv
+import json
+import glob
+import hashlib
+import subprocess
+import tempfile
+import threading
+from collections import deque
+from datetime import datetime, timedelta, date
+from pathlib import Path
+import time
+
+import queue
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+
+import progress
+
+# Lines of child output kept per stream and step (ring buffer)
+LOG_TAIL_LINES = 200
+# Lines of stderr echoed when a step fails
+ERROR_TAIL_LINES = 20
+# Seconds between live progress lines for the same stage
+PROGRESS_EVERY = 5
+
+# Bounded output logs of every step run so far: {description: {"stdout", "stderr"}}
+STEP_LOGS = {}
+
+# Small committed summary of the last completed run, checked before any bulk
+# data (caiso_supply.tar.gz) is extracted
+STATE_FILE = "update_state.json"
+# Charts whose hashes are recorded, to detect partial or hand-edited runs;
+# only those committed (see committed_charts) so a fresh checkout matches
+STATE_OUTPUTS = "*.png"
+
+# --stream: days allowed to wait between two pipeline stages
+STREAM_QUEUE_DAYS = 4
+# --stream: days downloading at once. Demand and supply downloaders each take
+# one day at a time (fixed temp file names), so two days overlap them.
+STREAM_IO_WORKERS = 2
+STREAM_CPU_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# Share of a day's expected 5-minute intervals its files must contain
+MIN_INTERVAL_FRACTION = 0.9
+
+# Color codes for Windows console
+class Colors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+def log(message, color=Colors.OKBLUE):
+    """Print colored log message with timestamp"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"{color}[{timestamp}] {message}{Colors.ENDC}")
+
+def log_header(message):
+    """Print section header"""
+    print(f"\n{'='*70}")
+    log(message, Colors.HEADER + Colors.BOLD)
+    print('='*70)
+
+def log_success(message):
+    """Print success message"""
+    log(f"✓ {message}", Colors.OKGREEN)
+
+def log_error(message):
+    """Print error message"""
+    log(f"✗ {message}", Colors.FAIL)
+
+def log_warning(message):
+    """Print warning message"""
+    log(f"⚠ {message}", Colors.WARNING)
+
+def _drain(stream, buffer):
+    """Read a child output stream line by line into a bounded ring buffer"""
+    for line in stream:
+        buffer.append(line.rstrip("\n"))
+    stream.close()
+
+def run_command(command, description, timeout=600):
+    """Run a shell command, streaming its progress events and keeping bounded logs
+
+    Child output is kept in ring buffers of the last LOG_TAIL_LINES lines per
+    stream, so memory stays flat however much a step prints. Progress events
+    written through progress.report() are shown live with throughput and ETA.
+    """
+    log(f"Running: {description}")
+    fd, progress_path = tempfile.mkstemp(prefix="progress_", suffix=".jsonl")
+    os.close(fd)
+    env = dict(os.environ)
+    env[progress.PROGRESS_ENV] = progress_path
+    env["PYTHONUNBUFFERED"] = "1"
+
+    stdout_tail = deque(maxlen=LOG_TAIL_LINES)
+    stderr_tail = deque(maxlen=LOG_TAIL_LINES)
+    STEP_LOGS[description] = {"stdout": stdout_tail, "stderr": stderr_tail}
+
+    try:
+        proc = subprocess.Popen(
+            command,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            env=env
+        )
+        readers = [
+            threading.Thread(target=_drain, args=(proc.stdout, stdout_tail), daemon=True),
+            threading.Thread(target=_drain, args=(proc.stderr, stderr_tail), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+
+        tail = progress.ProgressTail(progress_path)
+        tracker = progress.ProgressTracker()
+        last_shown = {}
+        deadline = time.time() + timeout
+
+        while proc.poll() is None:
+            if time.time() > deadline:
+                proc.kill()
+                proc.wait()
+                log_error(f"{description} timed out")
+                return False, "Timeout"
+            _show_progress(tail.read(), tracker, last_shown)
+            time.sleep(0.25)
+
+        for reader in readers:
+            reader.join(timeout=5)
+        _show_progress(tail.read(), tracker, last_shown, final=True)
+
+        if proc.returncode == 0:
+            log_success(f"{description} completed")
+            return True, "\n".join(stdout_tail)
+        else:
+            log_error(f"{description} failed")
+            for line in list(stderr_tail)[-ERROR_TAIL_LINES:]:
+                print(f"  Error: {line}")
+            return False, "\n".join(stderr_tail)
+    except Exception as e:
+        log_error(f"{description} error: {str(e)}")
+        return False, str(e)
+    finally:
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+
+def _show_progress(events, tracker, last_shown, final=False):
+    """Print progress events, at most one line per stage every PROGRESS_EVERY seconds"""
+    latest = {}
+    for event in events:
+        text = tracker.describe(event)
+        latest[event.get("stage")] = (event, text)
+
+    now = time.time()
+    for stage, (event, text) in latest.items():
+        finished = event.get("total") is not None and event.get("done", 0) >= event["total"]
+        if final or finished or now - last_shown.get(stage, 0) >= PROGRESS_EVERY:
+            last_shown[stage] = now
+            log(f"  ↳ {text}", Colors.OKCYAN)
+
+def get_last_data_date():
+    """Find the most recent date in our data files"""
+    try:
+        # Check renewable penetration daily data
+        if os.path.exists("renewable_penetration_daily_corrected_full.json"):
+            with open("renewable_penetration_daily_corrected_full.json") as f:
+                data = json.load(f)
+                dates = sorted(data.keys())
+                if dates:
+                    last_date = datetime.strptime(dates[-1], "%Y-%m-%d").date()
+                    return last_date
+    except Exception as e:
+        log_warning(f"Could not read existing data: {e}")
+
+    # Default to yesterday if no data found
+    return date.today() - timedelta(days=2)
+
+def get_missing_dates(last_date):
+    """Get list of dates between last_date and yesterday that need to be downloaded
+
+    Also verifies that source files exist for the last_date itself.
+    If demand or supply files are missing for last_date, includes it in missing list.
+    """
+    yesterday = date.today() - timedelta(days=1)
+    missing = []
+
+    # First, verify source files exist for the last_date
+    demand_file = Path("caiso_demand_downloads") / f"{last_date.strftime('%Y%m%d')}_demand.csv"
+    supply_file = Path("caiso_supply") / f"{last_date.strftime('%Y%m%d')}_fuelsource.csv"
+
+    files_missing = []
+    if not demand_file.exists():
+        files_missing.append("demand CSV")
+    if not supply_file.exists():
+        files_missing.append("supply CSV")
+
+    if files_missing:
+        log_warning(f"Source files missing for {last_date.strftime('%Y-%m-%d')}: {', '.join(files_missing)}")
+        log_warning("Will re-download this date to fix missing files")
+        missing.append(last_date)
+
+    # Then check for any dates after last_date
+    if last_date < yesterday:
+        current = last_date + timedelta(days=1)
+        while current <= yesterday:
+            missing.append(current)
+            current += timedelta(days=1)
+
+    if not missing:
+        log_success("Data is up to date and all source files verified")
+
+    return missing
+
+def _latest_file_date(directory, suffix):
+    """Newest YYYYMMDD<suffix> file date in directory, as an ISO string"""
+    if not os.path.isdir(directory):
+        return None
+    stamps = [e.name[:8] for e in os.scandir(directory) if e.name.endswith(suffix)]
+    stamps = [s for s in stamps if s.isdigit()]
+    return datetime.strptime(max(stamps), "%Y%m%d").date().isoformat() if stamps else None
+
+def _latest_json_date(path):
+    """Newest date key of a {date: ...} JSON file"""
+    try:
+        with open(path) as f:
+            return max(json.load(f))
+    except Exception:
+        return None
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+def source_watermarks():
+    """Latest date present for each data source"""
+    return {
+        "demand": _latest_file_date("caiso_demand_downloads", "_demand.csv"),
+        "supply": _latest_file_date("caiso_supply", "_fuelsource.csv"),
+        "lmp": _latest_json_date("caiso_prices.json"),
+        "ancillary": _latest_json_date("ancillary_services.json"),
+    }
+
+def load_state():
+    try:
+        with open(STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def committed_charts():
+    """Charts committed with a run: all but the originals served from web/"""
+    from web_images import published_charts
+    published = set(published_charts())
+    return [p for p in sorted(glob.glob(STATE_OUTPUTS)) if p[:-4] not in published]
+
+def save_state(completed_date):
+    """Record a completed run: last date, source watermarks and output hashes
+
+    Pixel-identical charts are first restored to their committed bytes, so the
+    recorded hashes are those of the files the commit will hold.
+    """
+    from chart_output import restore_unchanged
+    charts = committed_charts()
+    restore_unchanged(charts)
+    state = {
+        "last_completed_date": completed_date.isoformat(),
+        "completed_at": datetime.now().isoformat(timespec="seconds"),
+        "watermarks": source_watermarks(),
+        "outputs": {path: _file_digest(path) for path in charts},
+    }
+    with open(STATE_FILE, "w") as f:
+        json.dump(state, f, indent=2)
+    log_success(f"Saved update state through {state['last_completed_date']}")
+
+def check_state(state):
+    """(up_to_date, reason) from the state file alone, without bulk data
+
+    Up to date means: the last completed date is yesterday or later, demand and
+    supply watermarks reach it, and every recorded output is unchanged.
+    """
+    if not state:
+        return False, f"No {STATE_FILE}"
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    completed = state.get("last_completed_date", "")
+    if completed < yesterday:
+        return False, f"Last completed date {completed} is before {yesterday}"
+    watermarks = state.get("watermarks", {})
+    for source in ("demand", "supply"):
+        if (watermarks.get(source) or "") < completed:
+            return False, f"{source} watermark {watermarks.get(source)} is behind {completed}"
+    for path, digest in state.get("outputs", {}).items():
+        if not os.path.exists(path) or _file_digest(path) != digest:
+            return False, f"Output {path} is missing or changed since the last run"
+    return True, f"Up to date through {completed} (completed {state.get('completed_at')})"
+
+def download_missing_demand(missing_dates):
+    """Download demand CSV files for missing dates"""
+    if not missing_dates:
+        return True
+
+    log_header(f"STEP 1: Downloading Demand Data ({len(missing_dates)} days)")
+
+    # Check which demand files are actually missing
+    demand_dir = Path("caiso_demand_downloads")
+    actually_missing = []
+
+    for d in missing_dates:
+        demand_file = demand_dir / f"{d.strftime('%Y%m%d')}_demand.csv"
+        if not demand_file.exists():
+            actually_missing.append(d)
+
+    if not actually_missing:
+        log_success("All demand files already exist")
+        return True
+
+    log(f"Need to download {len(actually_missing)} demand CSV files")
+    return download_demand_files(actually_missing,
+                                 f"Downloading {len(actually_missing)} demand CSV files")
+
+def download_demand_files(dates, description):
+    """Run the demand downloader for dates (it reads temp_missing_dates.txt)"""
+    # Create temp file with dates
+    with open("temp_missing_dates.txt", "w") as f:
+        for d in dates:
+            f.write(d.strftime("%Y-%m-%d") + "\n")
+
+    # Run download script (allow ~60 seconds per date for Selenium)
+    timeout_seconds = max(60, len(dates) * 60)
+    success, _ = run_command(
+        "python download_missing_dates.py",
+        description,
+        timeout=timeout_seconds
+    )
+
+    # Clean up temp file
+    if os.path.exists("temp_missing_dates.txt"):
+        os.remove("temp_missing_dates.txt")
+
+    return success
+
+def download_missing_supply(missing_dates):
+    """Download supply/fuelsource CSV files for missing dates"""
+    if not missing_dates:
+        return True
+
+    log_header(f"STEP 2: Downloading Supply Data ({len(missing_dates)} days)")
+
+    # Check which supply files are missing
+    missing_supply = []
+    for d in missing_dates:
+        supply_file = f"caiso_supply/{d.strftime('%Y%m%d')}_fuelsource.csv"
+        if not os.path.exists(supply_file):
+            missing_supply.append(d)
+
+    if not missing_supply:
+        log_success("All supply files already exist")
+        return True
+
+    log(f"Need to download {len(missing_supply)} supply files")
+    return download_supply_files(missing_supply,
+                                 f"Downloading {len(missing_supply)} supply CSV files")
+
+def download_supply_files(dates, description):
+    """Run the supply downloader for dates (it reads temp_supply_dates.txt)"""
+    # Create temp file with dates
+    with open("temp_supply_dates.txt", "w") as f:
+        for d in dates:
+            f.write(d.strftime("%Y-%m-%d") + "\n")
+
+    # Run download script (allow ~3 minutes per date for Playwright with retries)
+    # Each download can take: 60s × 3 retries + exponential backoff = ~180s max
+    timeout_seconds = max(180, len(dates) * 180)
+    success, _ = run_command(
+        "python download_caiso_supply_browser.py",
+        description,
+        timeout=timeout_seconds
+    )
+
+    # Clean up temp file
+    if os.path.exists("temp_supply_dates.txt"):
+        os.remove("temp_supply_dates.txt")
+
+    return success
+
+def fetch_planned_prices(product, missing_dates):
+    """Fetch missing_dates for one product in batched, cached OASIS windows
+
+    fetch_planner merges the days into caiso_prices.json/ancillary_services.json;
+    a failed window only leaves its days for the fetch script that runs next.
+    """
+    if not missing_dates:
+        return True
+    dates = " ".join(d.strftime("%Y-%m-%d") for d in missing_dates)
+    success, _ = run_command(
+        f"python fetch_planner.py --fetch --product {product} {dates}",
+        f"Fetching {len(missing_dates)} days of {product} prices in planned windows",
+        timeout=300
+    )
+    if not success:
+        log_warning(f"Planned {product} fetch incomplete; the fetch script will retry")
+    return success
+
+def update_lmp_prices(missing_dates=()):
+    """Update LMP prices for new dates"""
+    log_header("STEP 3: Updating LMP Prices")
+
+    fetch_planned_prices("lmp", missing_dates)
+    success, _ = run_command(
+        "python fetch_prices_historical.py",
+        "Fetching latest LMP prices",
+        timeout=300
+    )
+
+    return success
+
+def update_as_prices(missing_dates=()):
+    """Update Ancillary Services prices for new dates"""
+    log_header("STEP 4: Updating Ancillary Services Prices")
+
+    fetch_planned_prices("as", missing_dates)
+    success, _ = run_command(
+        "python fetch_as_prices.py",
+        "Fetching latest A/S prices",
+        timeout=300
+    )
+
+    return success
+
+def recalculate_penetration():
+    """Recalculate renewable penetration with corrected methodology"""
+    log_header("STEP 5: Recalculating Renewable Penetration")
+
+    # Recalculate daily penetration
+    log("Processing daily penetration data...")
+    success1, _ = run_command(
+        "python process_renewable_penetration_with_demand_csv_v3.py",
+        "Daily penetration (energy-weighted)",
+        timeout=600
+    )
+
+    # Recalculate hourly penetration
+    log("Processing hourly penetration data...")
+    success2, _ = run_command(
+        "python process_renewable_penetration_hourly_corrected.py",
+        "Hourly penetration (5-min aggregated)",
+        timeout=600
+    )
+
+    # Process 2026 Q1 if needed
+    log("Processing 2026 Q1 data...")
+    success3, _ = run_command(
+        "python process_2026_hourly_corrected.py",
+        "2026 Q1 hourly data",
+        timeout=300
+    )
+
+    # Merge datasets
+    if success1 and success2:
+        try:
+            log("Merging 2026 Q1 data with main dataset...")
+            with open('renewable_penetration_daily_corrected_full.json') as f:
+                data_main = json.load(f)
+
+            if os.path.exists('renewable_penetration_daily_v5.json'):
+                with open('renewable_penetration_daily_v5.json') as f:
+                    data_2026 = json.load(f)
+
+                merged = {**data_main, **data_2026}
+                sorted_data = dict(sorted(merged.items()))
+
+                with open('renewable_penetration_daily_corrected_full.json', 'w') as f:
+                    json.dump(sorted_data, f, indent=2)
+
+                log_success("Merged 2026 Q1 data")
+
+            # Merge hourly
+            with open('renewable_penetration_hourly_corrected.json') as f:
+                hourly_main = json.load(f)
+
+            if os.path.exists('renewable_penetration_hourly_2026q1_corrected.json'):
+                with open('renewable_penetration_hourly_2026q1_corrected.json') as f:
+                    hourly_2026 = json.load(f)
+
+                merged_hourly = {**hourly_main, **hourly_2026}
+                sorted_hourly = dict(sorted(merged_hourly.items()))
+
+                with open('renewable_penetration_hourly_corrected.json', 'w') as f:
+                    json.dump(sorted_hourly, f, indent=2)
+
+                log_success("Merged hourly 2026 Q1 data")
+
+        except Exception as e:
+            log_warning(f"Merge error: {e}")
+
+    return success1 and success2
+
+def ingest_new_days(dates=None):
+    """Per-day incremental engines (each only processes new/changed supply days)
+
+    dates: restrict the engines to these days (streaming mode passes the days
+    that passed validation, so files still downloading are never read).
+    """
+    only = f" --dates {','.join(d.isoformat() for d in dates)}" if dates else ""
+
+    # Data-quality rules over new/changed supply days (flags feed the charts)
+    log("Scanning supply data quality...")
+    success1, _ = run_command(
+        "python quality_scan.py" + only,
+        "Supply data quality scan",
+        timeout=300
+    )
+
+    # Emissions intensity (incremental: only days not yet computed)
+    log("Processing emissions intensity...")
+    success2, _ = run_command(
+        "python emissions.py" + only,
+        "Average and marginal emissions intensity",
+        timeout=600
+    )
+
+    # Net-load ramps at 5/15/60/180 minutes (incremental: changed days only)
+    log("Processing net-load ramps...")
+    success3, _ = run_command(
+        "python ramp_engine.py" + only,
+        "Multi-horizon net-load ramps",
+        timeout=300
+    )
+
+    return success1 and success2 and success3
+
+def update_supporting_data(ingest=True):
+    """Update supporting data files (natural gas, energy breakdown, emissions, profiles)
+
+    ingest=False skips the per-day engines (streaming mode has already run
+    them on each validated batch).
+    """
+    log_header("STEP 6: Updating Supporting Data")
+
+    # Natural gas data
+    log("Processing natural gas data...")
+    success1, _ = run_command(
+        "python process_natural_gas_data.py",
+        "Natural gas generation statistics",
+        timeout=300
+    )
+
+    # Daily energy breakdown
+    log("Processing daily energy breakdown...")
+    success2, _ = run_command(
+        "python process_daily_energy.py",
+        "Daily energy breakdown",
+        timeout=300
+    )
+
+    # Quality scan, emissions and ramps
+    success3 = ingest_new_days() if ingest else True
+
+    # Simulator seasonal profiles (rewritten only when the source months change)
+    log("Checking simulator seasonal profiles...")
+    success4, _ = run_command(
+        "python generate_seasonal_profiles.py",
+        "Seasonal load and renewable profiles",
+        timeout=300
+    )
+
+    return success1 and success2 and success3 and success4
+
+def regenerate_charts():
+    """Regenerate all charts for the website"""
+    log_header("STEP 7: Regenerating Charts")
+
+    charts = [
+        ("plot_renewable_penetration_improved_v3.py", "Main renewable penetration chart"),
+        ("plot_daily_metrics_4panel.py", "4-panel daily metrics dashboard"),
+        ("plot_natural_gas_generation.py", "Natural gas generation chart"),
+        ("plot_energy_breakdown.py", "Energy breakdown chart"),
+        ("plot_energy_breakdown_v2.py", "Energy breakdown V2 chart"),
+        ("plot_capacity_factors.py", "Capacity factor seasonal chart"),
+        ("plot_cf_lmp.py", "Capacity factor vs LMP chart"),
+        ("plot_ramp_rate_seasonal.py", "Ramp rate seasonal chart"),
+        ("plot_ramp_lmp.py", "Ramp rate vs LMP chart"),
+        ("plot_battery_gw_vs_lmp.py", "Battery capacity vs LMP chart"),
+        ("plot_lmp_vs_battery_by_year.py", "LMP vs battery by year chart"),
+    ]
+
+    all_success = True
+    for script, description in charts:
+        if os.path.exists(script):
+            success, _ = run_command(
+                f"python {script}",
+                description,
+                timeout=120
+            )
+            if not success:
+                all_success = False
+                log_warning(f"Chart generation failed: {description}")
+        else:
+            log_warning(f"Chart script not found: {script}")
+
+    # Keep the committed bytes of charts whose pixels did not change, so
+    # output hashes and web variants only see real changes
+    from chart_output import restore_unchanged
+    changed = restore_unchanged(sorted(glob.glob("*.png")))
+    log(f"{len(changed)} chart(s) changed")
+
+    # Quantized PNG + WebP/AVIF variants for the web page (changed charts only)
+    success, _ = run_command(
+        "python web_images.py",
+        "Web image variants",
+        timeout=900
+    )
+    if not success:
+        all_success = False
+        log_warning("Web image conversion failed")
+
+    return all_success
+
+def update_comprehensive_csv(use_incremental=True):
+    """Update the comprehensive CSV file"""
+    log_header("STEP 8: Updating Comprehensive CSV")
+
+    if use_incremental and os.path.exists("caiso_comprehensive_data.csv"):
+        # Fast incremental update - only append new dates
+        log("Using incremental update (appending new dates only)")
+        success, _ = run_command(
+            "python append_to_comprehensive_csv.py",
+            "Incremental CSV update (fast)",
+            timeout=300
+        )
+    else:
+        # Full regeneration
+        log("Using full regeneration (processing all dates)")
+        success, _ = run_command(
+            "python create_comprehensive_csv.py",
+            "Full CSV regeneration (may take several minutes)",
+            timeout=1800
+        )
+
+    return success
+
+# ── Streaming mode (--stream) ─────────────────────────────────────────────
+# End-of-stream marker passed down the stage queues
+_STREAM_END = None
+_DEMAND_LOCK = threading.Lock()
+_SUPPLY_LOCK = threading.Lock()
+
+def download_day(d):
+    """Download the day's missing demand/supply files; returns (ok, message)"""
+    stamp = d.strftime('%Y%m%d')
+    failed = []
+    if not os.path.exists(f"caiso_demand_downloads/{stamp}_demand.csv"):
+        with _DEMAND_LOCK:
+            if not download_demand_files([d], f"Demand CSV {d}"):
+                failed.append("demand")
+    if not os.path.exists(f"caiso_supply/{stamp}_fuelsource.csv"):
+        with _SUPPLY_LOCK:
+            if not download_supply_files([d], f"Supply CSV {d}"):
+                failed.append("supply")
+    if failed:
+        return False, f"{' and '.join(failed)} download failed"
+    return True, "downloaded"
+
+def demand_intervals(fpath):
+    """Number of rows with a Current demand value in a demand CSV (0 if unreadable)"""
+    if not os.path.exists(fpath):
+        return 0
+    with open(fpath, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [h.strip().lower() for h in next(reader, [])]
+        if "current demand" not in header:
+            return 0
+        col = header.index("current demand")
+        return sum(1 for row in reader if len(row) > col and row[0] and row[col].strip())
+
+def validate_day(d):
+    """Check a day's downloaded files (runs in a worker process); returns (ok, message)"""
+    from fuel_schema import read_fuel_day
+    from quality_scan import expected_intervals
+
+    stamp = d.strftime('%Y%m%d')
+    expected = expected_intervals(d)
+    try:
+        supply = read_fuel_day(f"caiso_supply/{stamp}_fuelsource.csv")
+    except Exception as e:
+        return False, f"supply CSV unreadable: {e}"
+    if len(supply.times) < expected * MIN_INTERVAL_FRACTION:
+        return False, f"supply CSV has {len(supply.times)}/{expected} intervals"
+    demand = demand_intervals(f"caiso_demand_downloads/{stamp}_demand.csv")
+    if demand < expected * MIN_INTERVAL_FRACTION:
+        return False, f"demand CSV has {demand}/{expected} intervals"
+    return True, f"{len(supply.times)} supply / {demand} demand intervals"
+
+def _stage_crashed(name, source, ended, failures, error):
+    """Record a crashed stage and keep consuming its input until the end marker
+
+    Draining keeps upstream stages from blocking on a queue nobody reads.
+    """
+    log_error(f"[{name}] stage crashed: {error}")
+    failures.append((name, "remaining days", f"stage crashed: {error}"))
+    while not ended:
+        ended = source.get() is _STREAM_END
+
+def _ordered_stage(name, source, sink, pool, task, workers, failures):
+    """Pass days from source to sink through pool.submit(task, day), in date order
+
+    At most `workers` days are in flight; a full sink blocks the stage, so a
+    slow downstream stage holds back this one instead of piling up work.
+    The end marker is always passed on, even if the stage crashes.
+    """
+    inflight = deque()
+    ended = False
+
+    def finish(d, future):
+        try:
+            ok, message = future.result()
+        except Exception as e:
+            ok, message = False, str(e)
+        if ok:
+            log(f"  [{name}] {d}: {message}", Colors.OKCYAN)
+            sink.put(d)
+        else:
+            log_warning(f"[{name}] {d}: {message}")
+            failures.append((name, d, message))
+
+    try:
+        while True:
+            d = source.get()
+            if d is _STREAM_END:
+                ended = True
+                break
+            inflight.append((d, pool.submit(task, d)))
+            if len(inflight) >= workers:
+                finish(*inflight.popleft())
+        while inflight:
+            finish(*inflight.popleft())
+    except Exception as e:
+        _stage_crashed(name, source, ended, failures, e)
+    finally:
+        sink.put(_STREAM_END)
+
+def _batch_stage(name, source, sink, run_batch, failures):
+    """Run run_batch once for all days waiting in source, then pass them on
+
+    Days that arrive while a batch runs form the next batch, so the stage
+    keeps up with a faster upstream instead of running once per day.
+    The end marker is always passed on, even if the stage crashes.
+    """
+    finished = False
+    try:
+        while not finished:
+            batch = [source.get()]
+            while batch[-1] is not _STREAM_END:
+                try:
+                    batch.append(source.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is _STREAM_END:
+                finished = True
+                batch.pop()
+            if not batch:
+                continue
+
+            log(f"[{name}] {len(batch)} day(s): {batch[0]} .. {batch[-1]}")
+            try:
+                ok = run_batch(batch)
+            except Exception as e:
+                log_error(f"[{name}] {e}")
+                ok = False
+            if not ok:
+                failures.append((name, batch[-1], "batch failed"))
+            if sink is not None:
+                for d in batch:
+                    sink.put(d)
+    except Exception as e:
+        _stage_crashed(name, source, finished, failures, e)
+    finally:
+        if sink is not None:
+            sink.put(_STREAM_END)
+
+def _fetch_prices(missing_dates):
+    # Planned windows first, then the fetch scripts pick up whatever is still missing
+    lmp_ok = update_lmp_prices(missing_dates)
+    return update_as_prices(missing_dates) and lmp_ok
+
+def stream_update(missing_dates):
+    """Per-day download -> validate -> ingest pipeline, then one rollup
+
+    Downloads (and the OASIS price fetches) run in a thread pool, validation
+    in a process pool; ingest (quality scan, emissions, ramps) runs in one
+    thread on whatever validated days are waiting, passing them explicitly,
+    once the price fetches have finished.
+    Stages are connected by bounded queues. The rollups over the full history
+    (penetration and supporting data) run once, after the last day and the
+    price fetches. Returns the step results for the summary.
+    """
+    log_header(f"STREAMING UPDATE ({len(missing_dates)} days)")
+    pending = queue.Queue()
+    for d in missing_dates:
+        pending.put(d)
+    pending.put(_STREAM_END)
+    downloaded = queue.Queue(maxsize=STREAM_QUEUE_DAYS)
+    validated = queue.Queue(maxsize=STREAM_QUEUE_DAYS)
+    failures = []
+
+    with ThreadPoolExecutor(max_workers=STREAM_IO_WORKERS + 1) as io_pool, \
+            ProcessPoolExecutor(max_workers=STREAM_CPU_WORKERS,
+                                # Forking while the stage threads run can copy held locks
+                                mp_context=multiprocessing.get_context("spawn")) as cpu_pool:
+        # Prices are fetched alongside the downloads, but ingest waits for
+        # them: emissions.py reads caiso_prices.json, which the fetchers rewrite
+        prices = io_pool.submit(_fetch_prices, missing_dates)
+
+        def ingest(batch):
+            wait([prices])
+            return ingest_new_days(batch)
+
+        stages = [
+            threading.Thread(target=_ordered_stage, args=(
+                "download", pending, downloaded, io_pool, download_day,
+                STREAM_IO_WORKERS, failures)),
+            threading.Thread(target=_ordered_stage, args=(
+                "validate", downloaded, validated, cpu_pool, validate_day,
+                STREAM_CPU_WORKERS, failures)),
+            threading.Thread(target=_batch_stage, args=(
+                "ingest", validated, None, ingest, failures)),
+        ]
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+        prices_ok = prices.result()
+
+    for name, d, message in failures:
+        log_warning(f"{name} failed for {d}: {message}")
+    stages_ok = not failures
+    if stages_ok:
+        log_success(f"All {len(missing_dates)} days streamed through the pipeline")
+
+    # Full-history rollups, once for the whole backfill
+    penetration_ok = recalculate_penetration()
+    supporting_ok = update_supporting_data(ingest=False)
+    return [prices_ok, stages_ok, penetration_ok, supporting_ok]
+
+def git_commit_and_push():
+    """Commit changes and push to GitHub"""
+    log_header("STEP 9: Pushing to GitHub")
+
+    # Check if there are changes
+    result = subprocess.run("git status --short", shell=True, capture_output=True, text=True)
+    if not result.stdout.strip():
+        log("No changes to commit")
+        return True
+
+    # Add files (only charts and HTML for website)
+    log("Staging updated files...")
+    # Charts the page serves from web/ (web_images.py rewrites their tags)
+    # keep their full-size originals local
+    originals = committed_charts()
+    published = len(glob.glob(STATE_OUTPUTS)) - len(originals)
+    # Remaining charts: only those whose pixels differ from the committed version
+    from chart_output import changed_charts
+    charts, unchanged = changed_charts(originals)
+    if unchanged:
+        subprocess.run(["git", "checkout", "--"] + unchanged, capture_output=True)
+    log(f"{len(charts)} chart(s) changed, {len(unchanged)} unchanged, "
+        f"{published} served from web/")
+
+    files_to_add = charts + [
+        "*.html",  # Any updated HTML files
+        "web",     # WebP/AVIF/quantized chart variants
+        "../grid-operator/seasonal_profiles.json",       # Generated simulator profiles
+        "../grid-dispatch-test/seasonal_profiles.json",
+    ]
+
+    for file_pattern in files_to_add:
+        subprocess.run(f"git add {file_pattern}", shell=True, capture_output=True)
+    # The state file is JSON (ignored) but must travel with the repo
+    subprocess.run(["git", "add", "-f", STATE_FILE], capture_output=True)
+
+    log("Note: JSON/CSV data files are not pushed (run locally only)")
+
+    # Create commit message
+    today = date.today()
+    commit_msg = f"Auto-update charts for {today.strftime('%a %m/%d/%Y')}"
+
+    # Commit
+    log("Creating commit...")
+    success1, _ = run_command(
+        f'git commit -m "{commit_msg}"',
+        "Git commit",
+        timeout=30
+    )
+
+    if not success1:
+        log_warning("No changes to commit or commit failed")
+        return True  # Don't fail if nothing to commit
+
+    # Push to simbooni branch (website branch)
+    log("Pushing to GitHub (simbooni branch)...")
+    success2, _ = run_command(
+        "git push origin simbooni",
+        "Git push",
+        timeout=60
+    )
+
+    return success2
+
+def main():
+    """Main execution function"""
+    start_time = time.time()
+
+    print("\n" + "="*70)
+    print(f"{Colors.HEADER}{Colors.BOLD}CAISO DAILY DATA UPDATE{Colors.ENDC}")
+    print(f"{Colors.HEADER}Automated update script for eshan-website{Colors.ENDC}")
+    print("="*70 + "\n")
+
+    # Fast path: decide from the state file alone whether there is any work
+    if "--check" in sys.argv or "--force" not in sys.argv:
+        up_to_date, reason = check_state(load_state())
+        if "--check" in sys.argv:
+            log(reason)
+            return 0 if up_to_date else 1
+        if up_to_date:
+            log_success(reason)
+            log("Run with --force flag to update anyway")
+            return 0
+
+    log(f"Starting update process at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    # Step 0: Check for missing dates
+    log_header("STEP 0: Checking for Missing Dates")
+    last_date = get_last_data_date()
+    log(f"Last data date: {last_date.strftime('%Y-%m-%d')}")
+
+    missing_dates = get_missing_dates(last_date)
+    if missing_dates:
+        if missing_dates == [last_date]:
+            log_warning("Source files incomplete for last date - will re-download")
+        else:
+            log_warning(f"Found {len(missing_dates)} missing/incomplete dates:")
+            for d in missing_dates[:5]:
+                log(f"  - {d.strftime('%Y-%m-%d')}")
+            if len(missing_dates) > 5:
+                log(f"  ... and {len(missing_dates) - 5} more")
+    else:
+        # No missing dates and all files verified
+        # Ask if user wants to continue anyway
+        if "--force" in sys.argv:
+            log("Force mode enabled, continuing anyway")
+        else:
+            log("Run with --force flag to update anyway")
+            return 0
+
+    # Execute update steps
+    steps_success = []
+
+    if "--stream" in sys.argv and missing_dates:
+        # Download and process day by day, overlapping the two
+        steps_success.extend(stream_update(missing_dates))
+    else:
+        # Download data
+        steps_success.append(download_missing_demand(missing_dates))
+        steps_success.append(download_missing_supply(missing_dates))
+        steps_success.append(update_lmp_prices(missing_dates))
+        steps_success.append(update_as_prices(missing_dates))
+
+        # Process data
+        steps_success.append(recalculate_penetration())
+        steps_success.append(update_supporting_data())
+
+    # Generate outputs
+    steps_success.append(regenerate_charts())
+
+    # Update comprehensive CSV (always, unless --skip-csv flag)
+    if "--skip-csv" in sys.argv:
+        log_warning("Skipping comprehensive CSV update (--skip-csv flag)")
+        steps_success.append(True)
+    else:
+        # Use full regeneration if --full-csv flag is set
+        use_incremental = "--full-csv" not in sys.argv
+        steps_success.append(update_comprehensive_csv(use_incremental=use_incremental))
+
+    # Record the completed run before committing, so the state travels with it
+    if all(steps_success):
+        save_state(missing_dates[-1] if missing_dates else last_date)
+
+    # Push to GitHub (CI passes --no-git and commits in its own workflow step)
+    if "--no-git" in sys.argv:
+        log("Skipping git commit/push (--no-git flag)")
+    else:
+        steps_success.append(git_commit_and_push())
+
+    # Summary
+    elapsed = time.time() - start_time
+    print("\n" + "="*70)
+    log_header("UPDATE SUMMARY")
+
+    total_steps = len(steps_success)
+    successful_steps = sum(steps_success)
+
+    if successful_steps == total_steps:
+        log_success(f"All {total_steps} steps completed successfully!")
+    else:
+        failed_steps = total_steps - successful_steps
+        log_warning(f"{successful_steps}/{total_steps} steps completed ({failed_steps} failed)")
+
+    log(f"Total time: {elapsed/60:.1f} minutes")
+
+    if missing_dates:
+        log(f"Updated data through: {missing_dates[-1].strftime('%Y-%m-%d')}")
+
+    print("="*70 + "\n")
+
+    return 0 if successful_steps == total_steps else 1
+
+if __name__ == "__main__":
+    exit_code = main()
+
+    # Keep window open if run by double-clicking
+    if len(sys.argv) == 1:
+        input("\nPress Enter to close...")
+
+    sys.exit(exit_code)
@@ -0,0 +1,351 @@
+"""
+Emissions intensity for every 5-minute interval of the fuelsource history
+
+Computes, from the fuel mix in caiso_supply/*_fuelsource.csv:
+  - emissions (tCO2/h) = sum over fuels of MW x emission factor
+  - average intensity (tCO2/MWh) = emissions / generation serving load
+  - marginal intensity (tCO2/MWh) = slope of emissions vs generation over a
+    trailing one-hour window (least squares, vectorized with cumulative sums);
+    empty where the window spans missing intervals or days
+
+History is processed in chunks of CHUNK_DAYS files and appended to
+emissions_5min.csv. Hourly means (hour keys as in caiso_prices.json) are kept
+in emissions_hourly.json and joined to LMP in emissions_lmp_hourly.json for
+carbon-cost charts.
+
+emissions_state.json records the size:mtime fingerprint of every day written.
+A run recomputes from the first new or changed day (e.g. a re-downloaded
+file) onward: the CSV is cut back to that day and the later days are
+appended again in order. The hourly means and then the state are saved
+together at checkpoints (every CHECKPOINT_SECONDS and at the end); CSV rows
+past the last checkpoint are cut again on the next run, so an interrupted run
+resumes from its last checkpoint with all three outputs in step.
+
+Usage:
+    python emissions.py            # incremental (new days only)
+    python emissions.py --full     # recompute the whole history
+    python emissions.py --dates 2026-03-01,2026-03-02   # only these new days
+"""
+import os
+import sys
+import json
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import progress
+from fuel_schema import (CANONICAL_FUELS, FUEL_INDEX, SchemaRegistry, dates_arg,
+                         file_fingerprint, minutes_of_day, read_fuel_day, read_supply_days,
+                         supply_files)
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_CSV = os.path.join(script_dir, "emissions_5min.csv")
+HOURLY_JSON = os.path.join(script_dir, "emissions_hourly.json")
+LMP_JOIN_JSON = os.path.join(script_dir, "emissions_lmp_hourly.json")
+PRICES_JSON = os.path.join(script_dir, "caiso_prices.json")
+STATE_FILE = os.path.join(script_dir, "emissions_state.json")
+
+# Emission factors in tCO2/MWh. Imports use CARB's default for unspecified
+# power; gas and coal are fleet-average approximations. Biogenic CO2 from
+# biomass and biogas is excluded (as in CARB reporting), leaving only the
+# small CH4/N2O residual.
+EMISSION_FACTORS = {
+    "natural_gas": 0.40,
+    "coal": 0.95,
+    "imports": 0.428,
+    "biomass": 0.02,
+    "biogas": 0.01,
+}
+
+CHUNK_DAYS = 31
+# Seconds between saves of the hourly means and state during long runs
+CHECKPOINT_SECONDS = 30
+MARGINAL_WINDOW = 12  # intervals (one hour of 5-minute data)
+INTERVAL_MINUTES = 5
+
+CSV_COLUMNS = ["timestamp", "generation_mw", "emissions_tco2_h",
+               "avg_intensity", "marginal_intensity"]
+
+
+def factor_vector():
+    """Emission factors as an array in CANONICAL_FUELS order"""
+    factors = np.zeros(len(CANONICAL_FUELS))
+    for fuel, factor in EMISSION_FACTORS.items():
+        factors[FUEL_INDEX[fuel]] = factor
+    return factors
+
+
+def compute_intensity(values, factors, minutes=None, window=MARGINAL_WINDOW):
+    """Vectorized emissions, generation and intensities for an (n, fuels) array
+
+    Battery charging (negative batteries) is load, not generation, so it is
+    excluded from the generation total. The first window-1 rows have no
+    marginal estimate; pass leading context rows and drop them afterwards.
+    minutes: absolute minute of each row; when given, windows whose rows are
+    not consecutive 5-minute intervals get no marginal estimate.
+    Returns (generation, emissions, avg_intensity, marginal_intensity).
+    """
+    mw = np.nan_to_num(values)
+    mw_gen = mw.copy()
+    bat = FUEL_INDEX["batteries"]
+    mw_gen[:, bat] = np.maximum(mw_gen[:, bat], 0)
+
+    generation = mw_gen.sum(axis=1)
+    emissions = mw @ factors
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg = np.where(generation > 0, emissions / generation, np.nan)
+
+    # Trailing-window least-squares slope d(emissions)/d(generation)
+    n = len(generation)
+    marginal = np.full(n, np.nan)
+    if n >= window:
+        def rolling_sum(a):
+            c = np.concatenate([[0.0], np.cumsum(a)])
+            return c[window:] - c[:-window]
+
+        sx = rolling_sum(generation)
+        sy = rolling_sum(emissions)
+        sxx = rolling_sum(generation * generation)
+        sxy = rolling_sum(generation * emissions)
+        var = sxx - sx * sx / window
+        cov = sxy - sx * sy / window
+        # Ignore windows where load barely moves (slope is noise)
+        min_var = window * 50.0 ** 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(var > min_var, cov / var, np.nan)
+        marginal[window - 1:] = np.clip(slope, 0, factors.max())
+        if minutes is not None:
+            span = minutes[window - 1:] - minutes[:n - window + 1]
+            marginal[window - 1:][span != (window - 1) * INTERVAL_MINUTES] = np.nan
+
+    return generation, emissions, avg, marginal
+
+
+def last_written_date(path=OUTPUT_CSV):
+    """Date of the last row in the 5-minute output, or None"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as f:
+        f.seek(max(0, os.path.getsize(path) - 4096))
+        lines = f.read().decode("utf-8", errors="replace").strip().splitlines()
+    try:
+        return datetime.strptime(lines[-1].split(",")[0][:10], "%Y-%m-%d").date()
+    except (ValueError, IndexError):
+        return None
+
+
+def truncate_csv(path, first_date):
+    """Cut the 5-minute CSV back to the rows before first_date"""
+    key = first_date.isoformat().encode()
+    with open(path, "rb+") as f:
+        offset = len(f.readline())  # header
+        for line in f:
+            if line[:10] >= key:
+                break
+            offset += len(line)
+        f.truncate(offset)
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _day_minutes(d, day):
+    """Absolute minute of each interval of a FuelDay"""
+    return d.toordinal() * 1440 + minutes_of_day(day.times)
+
+
+def _write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def process(full=False, dates=None):
+    """Compute emissions for new/changed days (or all days with full=True)
+
+    dates: when given, only these days and days already computed are
+    candidates; other files on disk are left for a later run.
+    """
+    files = supply_files()
+    if not files:
+        print("No fuelsource files found")
+        return 0
+
+    state, hourly = {}, {}
+    if not full and os.path.exists(OUTPUT_CSV):
+        hourly = _load_json(HOURLY_JSON) or {}
+        state = _load_json(STATE_FILE)
+        if state is None:
+            # Outputs written before fingerprints were kept: trust the days
+            # present in both the CSV and the hourly means
+            last_date = last_written_date()
+            state = {d.isoformat(): file_fingerprint(p) for d, p in files.items()
+                     if last_date is not None and d <= last_date and d.isoformat() in hourly}
+
+    candidates = sorted(d for d in files
+                        if dates is None or d in dates or d.isoformat() in state)
+    if not candidates:
+        print("No new fuelsource files among the given dates")
+        return 0
+    changed = [d for d in candidates if state.get(d.isoformat()) != file_fingerprint(files[d])]
+    if not changed:
+        if state and not os.path.exists(STATE_FILE):
+            _write_json(STATE_FILE, dict(sorted(state.items())))
+        print(f"Emissions up to date through {candidates[-1]}")
+        return 0
+
+    # Everything from the first changed day on is rewritten, in date order
+    first = changed[0]
+    todo = [d for d in candidates if d >= first]
+    state = {k: v for k, v in state.items() if k < first.isoformat()}
+    hourly = {k: v for k, v in hourly.items() if k < first.isoformat()}
+
+    factors = factor_vector()
+    registry = SchemaRegistry()
+
+    # Trailing context from the day before the first new day, so marginal
+    # intensity is continuous across the incremental boundary
+    context = np.empty((0, len(CANONICAL_FUELS)))
+    context_minutes = np.empty(0, dtype=np.int64)
+    prev_day = first - timedelta(days=1)
+    if prev_day.isoformat() in state:
+        try:
+            day = read_fuel_day(files[prev_day], registry)
+            context = day.values[-(MARGINAL_WINDOW - 1):]
+            context_minutes = _day_minutes(prev_day, day)[-(MARGINAL_WINDOW - 1):]
+        except Exception:
+            pass
+
+    def checkpoint():
+        # Hourly means first: state must never cover days missing from them
+        _write_json(HOURLY_JSON, dict(sorted(hourly.items())))
+        _write_json(STATE_FILE, dict(sorted(state.items())))
+
+    if state:
+        truncate_csv(OUTPUT_CSV, first)
+        mode = "a"
+    else:
+        mode = "w"
+    with open(OUTPUT_CSV, mode, newline="") as out:
+        if mode == "w":
+            out.write(",".join(CSV_COLUMNS) + "\n")
+
+        last_checkpoint = time.time()
+        for start in range(0, len(todo), CHUNK_DAYS):
+            chunk = todo[start:start + CHUNK_DAYS]
+            prints = {d: file_fingerprint(files[d]) for d in chunk}
+            errors = {}
+            days = read_supply_days(chunk, files, registry, errors=errors)
+            for d, message in errors.items():
+                print(f"  Skipping {os.path.basename(files[d])}: {message}")
+
+            if days:
+                values = np.vstack([context] + [day.values for _, day in days])
+                minutes = np.concatenate([context_minutes] + [_day_minutes(d, day)
+                                                              for d, day in days])
+                generation, emissions, avg, marginal = compute_intensity(values, factors, minutes)
+                skip = len(context)
+                generation, emissions = generation[skip:], emissions[skip:]
+                avg, marginal = avg[skip:], marginal[skip:]
+                context = values[-(MARGINAL_WINDOW - 1):]
+                context_minutes = minutes[-(MARGINAL_WINDOW - 1):]
+
+                date_keys = [d.strftime("%Y-%m-%d") for d, _ in days]
+                day_index = np.repeat(np.arange(len(days)), [len(day.times) for _, day in days])
+                hours = np.concatenate([day.hours for _, day in days])
+                timestamps = [f"{date_keys[k]} {t}" for k, (_, day) in enumerate(days) for t in day.times]
+                out.writelines(_format_rows(timestamps, generation, emissions, avg, marginal))
+                hourly.update(_hourly_means(date_keys, day_index, hours, emissions, avg, marginal))
+
+            # Unreadable days are recorded too; they are retried when the file changes
+            state.update({d.isoformat(): fp for d, fp in prints.items()})
+            if time.time() - last_checkpoint >= CHECKPOINT_SECONDS:
+                out.flush()
+                checkpoint()
+                last_checkpoint = time.time()
+
+            progress.report("emissions", min(start + CHUNK_DAYS, len(todo)), len(todo), unit="days")
+            print(f"  Processed {min(start + CHUNK_DAYS, len(todo))}/{len(todo)} days...")
+
+    checkpoint()
+    registry.save()
+    write_lmp_join(hourly)
+
+    print(f"Emissions computed for {len(todo)} days ({todo[0]} through {todo[-1]})")
+    return len(todo)
+
+
+def _format_column(values, digits):
+    """Format a float array as CSV strings (NaN -> empty)"""
+    return [f"{v:.{digits}f}" if v == v else "" for v in values.tolist()]
+
+
+def _format_rows(timestamps, generation, emissions, avg, marginal):
+    """CSV lines for a chunk, formatted column-wise"""
+    columns = [timestamps, _format_column(generation, 0), _format_column(emissions, 1),
+               _format_column(avg, 4), _format_column(marginal, 4)]
+    return [",".join(fields) + "\n" for fields in zip(*columns)]
+
+
+def _hourly_means(date_keys, day_index, hours, emissions, avg, marginal):
+    """{date: {hour: {...}}} NaN-aware hourly means for a chunk of days
+
+    Each (day, hour) pair is one group; sums and counts come from a single
+    bincount per series.
+    """
+    groups = day_index * 25 + hours
+    size = len(date_keys) * 25
+    means = {}
+    for name, arr, digits in (("emissions_tco2", emissions, 1),
+                              ("avg_intensity", avg, 4),
+                              ("marginal_intensity", marginal, 4)):
+        valid = ~np.isnan(arr)
+        counts = np.bincount(groups[valid], minlength=size)
+        sums = np.bincount(groups[valid], weights=arr[valid], minlength=size)
+        means[name] = (counts, sums, digits)
+
+    result = {}
+    present = np.bincount(groups, minlength=size)
+    for g in np.flatnonzero(present):
+        day, hour = divmod(int(g), 25)
+        entry = {}
+        for name, (counts, sums, digits) in means.items():
+            if counts[g]:
+                entry[name] = round(float(sums[g] / counts[g]), digits)
+        result.setdefault(date_keys[day], {})[str(hour)] = entry
+    return result
+
+
+def write_lmp_join(hourly):
+    """Join hourly intensities to LMP and its GHG component by date and hour"""
+    if not os.path.exists(PRICES_JSON):
+        return
+    with open(PRICES_JSON) as f:
+        prices = json.load(f)
+
+    joined = {}
+    for date_key, hours in hourly.items():
+        day_prices = prices.get(date_key)
+        if not isinstance(day_prices, dict):
+            continue
+        for hour, entry in hours.items():
+            price = day_prices.get(hour)
+            if not isinstance(price, dict) or price.get("LMP") is None:
+                continue
+            record = dict(entry)
+            record["LMP"] = price["LMP"]
+            if price.get("GHG") is not None:
+                record["GHG"] = price["GHG"]
+            joined.setdefault(date_key, {})[hour] = record
+
+    _write_json(LMP_JOIN_JSON, joined)
+
+
+if __name__ == "__main__":
+    process(full="--full" in sys.argv, dates=dates_arg(sys.argv))
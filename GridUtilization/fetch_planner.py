@@ -0,0 +1,266 @@
+"""
+Range-coalescing fetch planner for OASIS price backfills
+
+Turns a set of missing (date, market, product) items into the fewest request
+windows OASIS allows (at most MAX_WINDOW_DAYS per query), runs the windows
+concurrently under a token-bucket rate limiter, and splits each response
+back into per-day records. A multi-week backfill becomes a handful of
+requests instead of one per day.
+
+Small gaps (up to MAX_GAP_DAYS) between missing days are bridged: fetching a
+day we already have is cheaper than an extra rate-limited request. Bridged
+days are dropped again when the responses are split.
+
+Responses go through oasis_cache, so re-runs only hit the network for recent,
+unsettled days. Fetched days are merged hour by hour into caiso_prices.json
+(LMP and its components) and ancillary_services.json (A/S prices for
+AS_REGION); a window that fails is reported and leaves its days missing for
+the next run.
+
+daily_update.py runs --fetch for the missing dates before each price step.
+
+Usage:
+    python fetch_planner.py 2026-03-01 2026-03-02 2026-03-20          # show plan
+    python fetch_planner.py --fetch 2026-03-01 2026-03-02 2026-03-20  # fetch and merge
+    python fetch_planner.py --fetch --product lmp 2026-03-01          # one product only
+"""
+import io
+import os
+import sys
+import csv
+import json
+import time
+import zipfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, date, time as dtime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+PRICE_FILES = {
+    "lmp": os.path.join(script_dir, "caiso_prices.json"),
+    "as": os.path.join(script_dir, "ancillary_services.json"),
+}
+
+MAX_WINDOW_DAYS = 31
+MAX_GAP_DAYS = 2
+# OASIS tolerates roughly one request every few seconds per client
+REQUESTS_PER_SECOND = 0.4
+BURST = 2
+WORKERS = 4
+
+CAISO_TZ = ZoneInfo("America/Los_Angeles")
+
+# Query parameters per product (the market is filled in per window)
+PRODUCTS = {
+    "lmp": {"queryname": "PRC_LMP", "version": "12", "node": "TH_SP15_GEN-APND"},
+    "as": {"queryname": "PRC_AS", "version": "12", "anc_type": "ALL", "anc_region": "ALL"},
+}
+DEFAULT_MARKET = "DAM"
+# Row column naming the price component -> JSON field, per product
+RECORD_FIELDS = {
+    "lmp": ("LMP_TYPE", {"LMP": "LMP", "MCC": "MCC", "MCE": "MEC", "MGHG": "GHG", "MCL": "LOSS"}),
+    "as": ("ANC_TYPE", {t: t for t in ("NR", "RD", "RMD", "RMU", "RU", "SR")}),
+}
+AS_REGION = "AS_CAISO_EXP"
+
+Window = namedtuple("Window", "product market start end")  # start/end inclusive dates
+
+
+def plan_windows(items, max_days=MAX_WINDOW_DAYS, max_gap_days=MAX_GAP_DAYS):
+    """Coalesce (date, market, product) items into maximal Windows"""
+    by_series = {}
+    for day, market, product in items:
+        by_series.setdefault((product, market), set()).add(day)
+
+    windows = []
+    for (product, market), days in sorted(by_series.items()):
+        days = sorted(days)
+        start = end = days[0]
+        for day in days[1:]:
+            gap = (day - end).days - 1
+            if gap <= max_gap_days and (day - start).days < max_days:
+                end = day
+            else:
+                windows.append(Window(product, market, start, end))
+                start = end = day
+        windows.append(Window(product, market, start, end))
+    return windows
+
+
+class TokenBucket:
+    """Thread-safe token bucket: rate tokens per second, up to burst"""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, burst=BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def _oasis_time(day):
+    """OASIS timestamp (GMT) of local midnight starting day"""
+    local = datetime.combine(day, dtime(0), tzinfo=CAISO_TZ)
+    return local.astimezone(timezone.utc).strftime("%Y%m%dT%H:%M-0000")
+
+
+def oasis_params(window):
+    params = dict(PRODUCTS[window.product])
+    params.update({
+        "market_run_id": window.market,
+        "startdatetime": _oasis_time(window.start),
+        "enddatetime": _oasis_time(window.end + timedelta(days=1)),
+        "resultformat": "6",  # CSV
+    })
+    return params
+
+
+def split_by_day(payload):
+    """{date: [row dicts]} from a zipped OASIS CSV response, by OPR_DT"""
+    days = {}
+    with zipfile.ZipFile(io.BytesIO(payload)) as archive:
+        for name in archive.namelist():
+            if not name.lower().endswith(".csv"):
+                continue
+            with archive.open(name) as f:
+                for row in csv.DictReader(io.TextIOWrapper(f, encoding="utf-8")):
+                    opr_dt = row.get("OPR_DT")
+                    if opr_dt:
+                        days.setdefault(date.fromisoformat(opr_dt[:10]), []).append(row)
+    return days
+
+
+def run_windows(windows, wanted=None, fetch=None, workers=WORKERS, bucket=None):
+    """Fetch windows concurrently; returns ({(product, market): {date: rows}}, failures)
+
+    wanted: optional set of (date, market, product) to keep (drops bridged days).
+    fetch: function(params) -> zipped payload; defaults to oasis_cache.get.
+    failures: [(window, error message)]; the other windows' days are still returned.
+    """
+    if fetch is None:
+        from oasis_cache import get as fetch
+    bucket = bucket or TokenBucket()
+
+    def task(window):
+        bucket.acquire()
+        return split_by_day(fetch(oasis_params(window)))
+
+    results, failures = {}, []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(task, w): w for w in windows}
+        for future in as_completed(futures):
+            window = futures[future]
+            try:
+                days = future.result()
+            except Exception as e:
+                failures.append((window, str(e)))
+                continue
+            series = results.setdefault((window.product, window.market), {})
+            for day, rows in days.items():
+                if not window.start <= day <= window.end:
+                    continue
+                if wanted is not None and (day, window.market, window.product) not in wanted:
+                    continue
+                series[day] = rows
+    return results, failures
+
+
+def _price(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def hourly_records(product, rows):
+    """{hour: {field: price}} for one day's rows, hour keys "1".."24" (OPR_HR)"""
+    key_column, fields = RECORD_FIELDS[product]
+    hours = {}
+    for row in rows:
+        field = fields.get(row.get(key_column))
+        if field is None:
+            continue
+        if product == "as" and row.get("ANC_REGION") != AS_REGION:
+            continue
+        value = _price(row.get("MW"))
+        hour = row.get("OPR_HR", "").strip()
+        if value is None or not hour.isdigit():
+            continue
+        hours.setdefault(str(int(hour)), {})[field] = value
+    return hours
+
+
+def merge_prices(results, files=PRICE_FILES):
+    """Merge fetched days into caiso_prices.json / ancillary_services.json
+
+    Only fetched hours are touched; other days, hours and fields are kept.
+    Returns the number of days merged.
+    """
+    merged = 0
+    for product, path in files.items():
+        days = {day: rows for (p, _), series in results.items() if p == product
+                for day, rows in series.items()}
+        if not days:
+            continue
+        data = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+        for day, rows in sorted(days.items()):
+            hours = hourly_records(product, rows)
+            if not hours:
+                continue
+            entry = data.setdefault(day.isoformat(), {})
+            for hour, record in hours.items():
+                entry.setdefault(hour, {}).update(record)
+            merged += 1
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(dict(sorted(data.items())), f)
+        os.replace(tmp, path)
+    return merged
+
+
+def main():
+    fetch = "--fetch" in sys.argv
+    products = list(PRODUCTS)
+    if "--product" in sys.argv:
+        products = [sys.argv[sys.argv.index("--product") + 1]]
+    days = [date.fromisoformat(a) for a in sys.argv[1:]
+            if not a.startswith("--") and a not in PRODUCTS]
+    if not days:
+        print(__doc__)
+        return 1
+
+    items = {(d, DEFAULT_MARKET, product) for d in days for product in products}
+    windows = plan_windows(items)
+    print(f"{len(items)} missing (date, market, product) items -> {len(windows)} requests")
+    for w in windows:
+        print(f"  {w.product:4s} {w.market} {w.start} .. {w.end} ({(w.end - w.start).days + 1} days)")
+
+    if fetch:
+        start = time.time()
+        results, failures = run_windows(windows, wanted=items)
+        print(f"Merged {merge_prices(results)} day(s) in {time.time() - start:.1f}s")
+        for window, message in failures:
+            print(f"  Failed {window.product} {window.start} .. {window.end}: {message}")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
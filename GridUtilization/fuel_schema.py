@@ -0,0 +1,264 @@
+"""
+Fuelsource CSV schema registry
+
+CAISO fuelsource CSVs have used different header spellings over the years
+("Large Hydro" / "Large hydro", "Natural Gas" / "Natural gas"). This module
+maps each file's header to the canonical fuel columns once, so per-row loops
+work on fixed column indexes instead of probing every spelling.
+
+The schema version detected for every file is recorded in
+fuel_schema_registry.json. Unknown columns are flagged there (and ignored);
+files with two spellings of the same fuel are rejected instead of silently
+double-counting it.
+"""
+import os
+import csv
+import json
+import glob
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+import progress
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_FILE = os.path.join(script_dir, "fuel_schema_registry.json")
+SUPPLY_DIR = os.path.join(script_dir, "caiso_supply")
+
+# Canonical fuel columns, in the order used by the comprehensive CSV
+CANONICAL_FUELS = [
+    "solar", "wind", "natural_gas", "nuclear", "large_hydro", "small_hydro",
+    "geothermal", "biomass", "biogas", "batteries", "imports", "other", "coal",
+]
+FUEL_INDEX = {fuel: i for i, fuel in enumerate(CANONICAL_FUELS)}
+
+# Raw header spellings that identify a schema version
+VERSION_SPELLINGS = {
+    "Large Hydro": "v1",
+    "Natural Gas": "v1",
+    "Large hydro": "v2",
+    "Natural gas": "v2",
+}
+
+# Extra spellings that do not follow the lower_snake_case rule
+ALIASES = {
+    "battery": "batteries",
+    "hydro_large": "large_hydro",
+    "hydro_small": "small_hydro",
+}
+
+TIME_COLUMN = "time"
+
+SEASONS = {
+    "winter": (12, 1, 2),
+    "spring": (3, 4, 5),
+    "summer": (6, 7, 8),
+    "fall": (9, 10, 11),
+}
+SEASON_OF_MONTH = {m: season for season, months in SEASONS.items() for m in months}
+
+FuelSchema = namedtuple("FuelSchema", ["version", "time_index", "columns", "unknown"])
+FuelDay = namedtuple("FuelDay", ["times", "hours", "values"])
+
+
+class SchemaError(ValueError):
+    """A fuelsource header that cannot be mapped unambiguously"""
+
+
+def canonical_name(column):
+    """Canonical fuel name for a raw header column, or None if unknown"""
+    key = column.strip().lower().replace("-", " ").replace(" ", "_")
+    key = ALIASES.get(key, key)
+    if key in FUEL_INDEX or key == TIME_COLUMN:
+        return key
+    return None
+
+
+def parse_header(header):
+    """Map a raw CSV header to a FuelSchema
+
+    columns is a list of (canonical index, raw column index) pairs. Raises
+    SchemaError if the header has no Time column or spells a fuel twice.
+    """
+    time_index = None
+    columns = []
+    seen = {}
+    unknown = []
+
+    for idx, raw in enumerate(header):
+        name = canonical_name(raw)
+        if name is None:
+            if raw.strip():
+                unknown.append(raw.strip())
+            continue
+        if name == TIME_COLUMN:
+            time_index = idx
+            continue
+        if name in seen:
+            raise SchemaError(f"Fuel '{name}' appears twice: '{seen[name]}' and '{raw.strip()}'")
+        seen[name] = raw.strip()
+        columns.append((FUEL_INDEX[name], idx))
+
+    if time_index is None:
+        raise SchemaError("No Time column in header")
+
+    versions = {VERSION_SPELLINGS[raw.strip()] for raw in header if raw.strip() in VERSION_SPELLINGS}
+    version = versions.pop() if len(versions) == 1 else "unrecognized"
+    return FuelSchema(version, time_index, columns, unknown)
+
+
+def hour_key(time_str):
+    """Hour key for a HH:MM time, with midnight as hour 24 (None if invalid)"""
+    try:
+        hour = int(time_str.split(":")[0])
+    except (ValueError, IndexError, AttributeError):
+        return None
+    return 24 if hour == 0 else hour
+
+
+def _to_float(text):
+    try:
+        return float(text) if text else np.nan
+    except ValueError:
+        return np.nan
+
+
+def _column_to_float(column):
+    """Convert a list of CSV strings to floats (blank or invalid -> NaN)"""
+    arr = np.array(column, dtype=str)
+    try:
+        return np.where(arr == "", "nan", arr).astype(float)
+    except ValueError:
+        return np.array([_to_float(text) for text in column], dtype=float)
+
+
+class SchemaRegistry:
+    """Per-file schema record persisted to fuel_schema_registry.json"""
+
+    def __init__(self, path=REGISTRY_FILE):
+        self.path = path
+        self.files = {}
+        self.dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.files = json.load(f)
+            except (OSError, ValueError):
+                self.files = {}
+
+    def record(self, fpath, schema=None, error=None):
+        """Record the schema (or the rejection reason) for one file"""
+        name = os.path.basename(fpath)
+        if error is not None:
+            entry = {"version": None, "rejected": str(error)}
+        else:
+            entry = {"version": schema.version}
+            if schema.unknown:
+                entry["unknown_columns"] = schema.unknown
+        if self.files.get(name) != entry:
+            self.files[name] = entry
+            self.dirty = True
+
+    def flagged(self):
+        """{filename: entry} for files that were rejected or had unknown columns"""
+        return {name: entry for name, entry in self.files.items()
+                if entry.get("rejected") or entry.get("unknown_columns")}
+
+    def save(self):
+        if not self.dirty:
+            return
+        # Write-then-rename: engines running back to back never see a torn file
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(dict(sorted(self.files.items())), f, indent=1)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+def read_fuel_day(fpath, registry=None):
+    """Read one fuelsource CSV into a FuelDay
+
+    values is an (n_rows, len(CANONICAL_FUELS)) float array in canonical
+    column order, NaN where a fuel is absent or unparseable. Rows without a
+    valid time are dropped. Raises SchemaError for rejected headers.
+    """
+    with open(fpath, "r", newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise SchemaError("Empty file")
+        try:
+            schema = parse_header(header)
+        except SchemaError as e:
+            if registry is not None:
+                registry.record(fpath, error=e)
+            raise
+        if registry is not None:
+            registry.record(fpath, schema)
+
+        time_index = schema.time_index
+        rows = [row for row in reader
+                if len(row) > time_index and hour_key(row[time_index]) is not None]
+
+    times = [row[time_index] for row in rows]
+    hours = np.array([hour_key(t) for t in times], dtype=np.int64)
+    values = np.full((len(rows), len(CANONICAL_FUELS)), np.nan)
+    for fuel_idx, col_idx in schema.columns:
+        column = [row[col_idx] if col_idx < len(row) else "" for row in rows]
+        values[:, fuel_idx] = _column_to_float(column)
+    return FuelDay(times, hours, values)
+
+
+# ── Supply-day helpers shared by the incremental engines ──────────────────
+def supply_files(supply_dir=SUPPLY_DIR):
+    """{date: path} for every fuelsource CSV"""
+    files = {}
+    for fpath in glob.glob(os.path.join(supply_dir, "*_fuelsource.csv")):
+        try:
+            files[datetime.strptime(os.path.basename(fpath).split("_")[0], "%Y%m%d").date()] = fpath
+        except ValueError:
+            continue
+    return files
+
+
+def dates_arg(argv):
+    """Set of dates from "--dates YYYY-MM-DD,..." in argv, or None when absent
+
+    Restricts an engine to days a caller (daily_update.py --stream) has
+    validated; other files on disk are left for a later run.
+    """
+    if "--dates" not in argv:
+        return None
+    i = argv.index("--dates")
+    text = argv[i + 1] if i + 1 < len(argv) else ""
+    return {datetime.strptime(s, "%Y-%m-%d").date() for s in text.split(",") if s}
+
+
+def file_fingerprint(fpath):
+    """size:mtime of a file; changes when a day is re-downloaded or corrected"""
+    stat = os.stat(fpath)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def minutes_of_day(times):
+    """Minutes since midnight for HH:MM strings"""
+    return np.array([int(t[:2]) * 60 + int(t[3:5]) for t in times], dtype=np.int64)
+
+
+def read_supply_days(dates, files, registry=None, stage=None, errors=None):
+    """[(date, FuelDay)] for dates (in the order given), skipping unreadable files
+
+    Files that fail to parse are left out and their message is stored in
+    errors ({date: message}) when given. Progress is reported under stage.
+    """
+    days = []
+    for i, d in enumerate(dates):
+        try:
+            days.append((d, read_fuel_day(files[d], registry)))
+        except Exception as e:
+            if errors is not None:
+                errors[d] = str(e)
+        if stage:
+            progress.report(stage, i + 1, len(dates), unit="files")
+    return days
@@ -0,0 +1,229 @@
+"""
+Generate seasonal load and renewable profiles for the grid simulators
+
+Derives the data fields of grid-operator/seasonal_profiles.json and
+grid-dispatch-test/seasonal_profiles.json from the 5-minute fuelsource
+history instead of hand-entered values:
+
+  - peakLoadsMW: highest hourly load per season
+  - hourlyPercentages: hourly load as % of each profile's peakMW
+    ("-high" profiles use the per-hour P90 envelope, all others the
+    per-hour median)
+  - solarCF / windCF: hourly output / installedCapacityMW (per-hour median)
+  - bands: per-hour P10/P90 of the above, for uncertainty shading
+
+Percentiles are taken independently for each hour across the season's days,
+so a profile is an envelope rather than the shape of any one observed day.
+Intervals masked by quality_scan.py (missing values, impossible jumps) are
+left out of the hourly means.
+
+Profiles use the LOOKBACK_MONTHS most recent complete months. Day x hour
+means and percentiles are computed with array reductions (bincount +
+percentile over the day axis). Other fields (names, baseload CFs, capacities)
+are left as they are. Files are rewritten only when the fingerprint of the
+underlying months changes, so normally once a month.
+
+Usage:
+    python generate_seasonal_profiles.py            # skip if months unchanged
+    python generate_seasonal_profiles.py --force
+"""
+import os
+import re
+import sys
+import json
+import hashlib
+import calendar
+
+import numpy as np
+
+from fuel_schema import FUEL_INDEX, SEASONS, SEASON_OF_MONTH, SchemaRegistry, read_fuel_day, supply_files
+from quality_scan import interval_mask, load_flags
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = os.path.join(script_dir, "seasonal_profiles_state.json")
+PROFILE_FILES = [
+    os.path.join(script_dir, "..", "grid-operator", "seasonal_profiles.json"),
+    os.path.join(script_dir, "..", "grid-dispatch-test", "seasonal_profiles.json"),
+]
+
+LOOKBACK_MONTHS = 12
+TYPICAL_PERCENTILE = 50
+HIGH_PERCENTILE = 90
+BAND_PERCENTILES = (10, 90)
+
+
+def supply_files_by_month():
+    """{(year, month): [(day, path)]} for every fuelsource CSV"""
+    months = {}
+    for d, fpath in sorted(supply_files().items()):
+        months.setdefault((d.year, d.month), []).append((d, fpath))
+    return months
+
+
+def complete_months(months):
+    """Most recent LOOKBACK_MONTHS months whose last day is present"""
+    complete = [ym for ym, days in sorted(months.items())
+                if max(d.day for d, _ in days) == calendar.monthrange(*ym)[1]]
+    return complete[-LOOKBACK_MONTHS:]
+
+
+def fingerprint(months, selected):
+    """Hash of the file names, sizes and mtimes of the selected months"""
+    digest = hashlib.sha256()
+    for ym in selected:
+        for d, fpath in months[ym]:
+            stat = os.stat(fpath)
+            digest.update(f"{os.path.basename(fpath)}:{stat.st_size}:{int(stat.st_mtime)};".encode())
+    return digest.hexdigest()[:16]
+
+
+def load_day_hour_means(months, selected):
+    """Arrays of per-day hourly means: (seasons, load, solar, wind)
+
+    load/solar/wind are (n_days, 24) MW arrays indexed by the hour the
+    interval starts in (0-23), as used by the simulators.
+    """
+    registry = SchemaRegistry()
+    # Intervals flagged by quality_scan.py are left out of the hourly means
+    flags = load_flags()
+    day_values, day_hours, day_seasons, day_valid = [], [], [], []
+    for ym in selected:
+        for d, fpath in months[ym]:
+            try:
+                day = read_fuel_day(fpath, registry)
+            except Exception:
+                continue
+            if len(day.times) == 0:
+                continue
+            day_values.append(day.values)
+            day_hours.append(np.array([int(t.split(":")[0]) % 24 for t in day.times]))
+            day_seasons.append(SEASON_OF_MONTH[d.month])
+            day_valid.append(interval_mask(flags, d.isoformat(), day.times))
+    registry.save()
+
+    n_days = len(day_values)
+    day_index = np.repeat(np.arange(n_days), [len(v) for v in day_values])
+    hours = np.concatenate(day_hours)
+    mw = np.nan_to_num(np.vstack(day_values))
+
+    # Gross load: all generation minus battery charging
+    bat = mw[:, FUEL_INDEX["batteries"]]
+    load = mw.sum(axis=1) - np.minimum(bat, 0)
+    series = {"load": load,
+              "solar": np.maximum(mw[:, FUEL_INDEX["solar"]], 0),
+              "wind": np.maximum(mw[:, FUEL_INDEX["wind"]], 0)}
+
+    valid = np.concatenate(day_valid)
+    groups = (day_index * 24 + hours)[valid]
+    counts = np.bincount(groups, minlength=n_days * 24)
+    means = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for name, values in series.items():
+            sums = np.bincount(groups, weights=values[valid], minlength=n_days * 24)
+            means[name] = (sums / counts).reshape(n_days, 24)
+    return np.array(day_seasons), means["load"], means["solar"], means["wind"]
+
+
+def season_stats(seasons, load, solar, wind):
+    """{season: {...}} per-hour percentile envelopes, each a 24-value array"""
+    percentiles = sorted({TYPICAL_PERCENTILE, HIGH_PERCENTILE, *BAND_PERCENTILES})
+    stats = {}
+    for season in SEASONS:
+        mask = seasons == season
+        if not mask.any():
+            continue
+        entry = {"peak_mw": float(np.nanmax(load[mask]))}
+        for name, values in (("load", load), ("solar", solar), ("wind", wind)):
+            pct = np.nanpercentile(values[mask], percentiles, axis=0)
+            entry[name] = dict(zip(percentiles, pct))
+        stats[season] = entry
+    return stats
+
+
+def _pct_of_peak(values, peak_mw):
+    return [int(round(v)) for v in 100.0 * np.nan_to_num(values) / peak_mw]
+
+
+def _cf(values, capacity_mw):
+    return [round(float(v), 2) for v in np.clip(np.nan_to_num(values) / capacity_mw, 0, 1)]
+
+
+def apply_stats(data, stats):
+    """Update the data-derived fields of one seasonal_profiles.json in place"""
+    region = data["california"]
+    capacity = region["renewables"]["installedCapacityMW"]
+    lo, hi = BAND_PERCENTILES
+
+    for season, entry in stats.items():
+        if season in region.get("peakLoadsMW", {}):
+            region["peakLoadsMW"][season] = int(round(entry["peak_mw"]))
+
+    for key, profile in region["profiles"].items():
+        season = key.split("-")[0]
+        if season not in stats:
+            continue
+        entry = stats[season]
+        # Per-hour envelope: each hour's percentile across the season's days
+        level = HIGH_PERCENTILE if key.endswith("-high") else TYPICAL_PERCENTILE
+        peak = profile["peakMW"]
+        profile["hourlyPercentages"] = _pct_of_peak(entry["load"][level], peak)
+        profile["solarCF"] = _cf(entry["solar"][TYPICAL_PERCENTILE], capacity["solar"])
+        profile["windCF"] = _cf(entry["wind"][TYPICAL_PERCENTILE], capacity["wind"])
+        profile["bands"] = {
+            "hourlyPercentages": {f"p{lo}": _pct_of_peak(entry["load"][lo], peak),
+                                  f"p{hi}": _pct_of_peak(entry["load"][hi], peak)},
+            "solarCF": {f"p{lo}": _cf(entry["solar"][lo], capacity["solar"]),
+                        f"p{hi}": _cf(entry["solar"][hi], capacity["solar"])},
+            "windCF": {f"p{lo}": _cf(entry["wind"][lo], capacity["wind"]),
+                       f"p{hi}": _cf(entry["wind"][hi], capacity["wind"])},
+        }
+
+
+def dumps_compact(data):
+    """JSON with 2-space indent but number arrays kept on one line"""
+    text = json.dumps(data, indent=2)
+    return re.sub(r"\[\s+([-0-9.,\s]+?)\s+\]",
+                  lambda m: "[" + ", ".join(v.strip() for v in m.group(1).split(",")) + "]",
+                  text)
+
+
+def main():
+    force = "--force" in sys.argv
+    months = supply_files_by_month()
+    selected = complete_months(months)
+    if not selected:
+        print("No complete months of fuelsource data")
+        return 1
+
+    fp = fingerprint(months, selected)
+    state = {}
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE) as f:
+            state = json.load(f)
+    if not force and state.get("fingerprint") == fp:
+        print(f"Seasonal profiles up to date ({selected[0][0]}-{selected[0][1]:02d} "
+              f"to {selected[-1][0]}-{selected[-1][1]:02d})")
+        return 0
+
+    print(f"Computing profiles from {selected[0][0]}-{selected[0][1]:02d} "
+          f"to {selected[-1][0]}-{selected[-1][1]:02d}...")
+    stats = season_stats(*load_day_hour_means(months, selected))
+
+    for path in PROFILE_FILES:
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            data = json.load(f)
+        apply_stats(data, stats)
+        with open(path, "w") as f:
+            f.write(dumps_compact(data) + "\n")
+        print(f"  Updated {os.path.relpath(path, script_dir)}")
+
+    with open(STATE_FILE, "w") as f:
+        json.dump({"fingerprint": fp,
+                   "months": [f"{y}-{m:02d}" for y, m in selected]}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
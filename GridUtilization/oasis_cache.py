@@ -0,0 +1,302 @@
+"""
+On-disk cache for CAISO OASIS responses
+
+OASIS is slow and rate-limited, and the price fetches re-request windows we
+already hold. get(params) returns the zipped response for an OASIS query,
+from disk when possible:
+
+  - Entries are keyed by a hash of the normalized query parameters and point
+    at a content-addressed payload (blobs/<sha256>.zip), so identical
+    responses are stored once.
+  - Queries ending before SETTLED_DAYS ago are settled: cached forever.
+  - Recent queries expire after RECENT_TTL_HOURS and are then revalidated
+    (If-None-Match / If-Modified-Since when the server sent validators,
+    otherwise refetched and compared by content hash).
+  - Total payload size is kept under MAX_CACHE_MB by evicting the least
+    recently used entries.
+  - OASIS reports errors (bad parameters, rate limits, no data yet) as an
+    HTTP 200 zip holding an error XML document. Such responses raise
+    OasisError and are never cached.
+
+The base URL can be overridden with OASIS_BASE_URL (e.g. a local stub server).
+
+fetch_planner.run_windows routes the price fetches through get(), from
+several threads.
+
+Usage from a fetch script:
+    from oasis_cache import get
+    payload = get({"queryname": "PRC_LMP", "market_run_id": "DAM", ...})
+
+    python oasis_cache.py --stats
+    python oasis_cache.py --prune
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import zipfile
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("OASIS_CACHE_DIR", os.path.join(script_dir, "oasis_cache"))
+OASIS_BASE_URL = os.environ.get("OASIS_BASE_URL", "https://oasis.caiso.com/oasisapi/SingleZip")
+
+# Prices for a trading day can still be corrected for a few days
+SETTLED_DAYS = 7
+RECENT_TTL_HOURS = 6
+MAX_CACHE_MB = 500
+REQUEST_TIMEOUT = 120
+# OASIS answers bursts with HTTP 429; wait and retry
+RETRY_WAITS = (5, 15, 45)
+
+# Parameters that do not change the response
+VOLATILE_PARAMS = {"resultformat_ts"}
+# Error documents: <m:ERR_CODE>1000</m:ERR_CODE><m:ERR_DESC>...</m:ERR_DESC>
+ERROR_CODE = re.compile(rb"<(?:\w+:)?ERR_CODE>\s*([^<]*?)\s*</")
+ERROR_DESC = re.compile(rb"<(?:\w+:)?ERR_DESC>\s*([^<]*?)\s*</")
+
+
+class OasisError(RuntimeError):
+    """OASIS answered with an error document instead of data"""
+
+
+def cache_key(params):
+    """Stable hash of the query parameters (order and case of names ignored)"""
+    items = sorted((str(k).lower(), str(v)) for k, v in params.items()
+                   if str(k).lower() not in VOLATILE_PARAMS)
+    return hashlib.sha256(urllib.parse.urlencode(items).encode()).hexdigest()[:32]
+
+
+def query_end_date(params):
+    """Trading date the query ends on, from enddatetime (YYYYMMDDThh:mm-zzzz)"""
+    for k, v in params.items():
+        if str(k).lower() == "enddatetime":
+            try:
+                return datetime.strptime(str(v)[:8], "%Y%m%d").date()
+            except ValueError:
+                return None
+    return None
+
+
+def is_settled(params, today=None):
+    end = query_end_date(params)
+    today = today or datetime.now().date()
+    return end is not None and end < today - timedelta(days=SETTLED_DAYS)
+
+
+def check_payload(payload):
+    """Raise OasisError unless payload is a zip without an OASIS error document"""
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(payload))
+    except zipfile.BadZipFile:
+        raise OasisError(f"Response is not a zip: {payload[:80]!r}")
+    with archive:
+        for name in archive.namelist():
+            if not name.lower().endswith(".xml"):
+                continue
+            text = archive.read(name)
+            code = ERROR_CODE.search(text)
+            if code is None and b"INVALID_REQUEST" not in text:
+                continue
+            message = code.group(1).decode(errors="replace") if code else "INVALID_REQUEST"
+            desc = ERROR_DESC.search(text)
+            if desc:
+                message += ": " + desc.group(1).decode(errors="replace")
+            raise OasisError(f"OASIS error {message} ({name})")
+
+
+class OasisCache:
+    """Index of query key -> payload hash plus a directory of payload blobs"""
+
+    def __init__(self, root=CACHE_DIR, max_bytes=MAX_CACHE_MB * 1024 * 1024,
+                 base_url=OASIS_BASE_URL):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        self.index_path = os.path.join(root, "index.json")
+        self.max_bytes = max_bytes
+        self.base_url = base_url
+        self.index = {}
+        self.hits = self.misses = self.revalidated = self.errors = 0
+        # Index and blob updates are serialized; requests run concurrently
+        self.lock = threading.Lock()
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path) as f:
+                    self.index = json.load(f)
+            except ValueError:
+                self.index = {}
+
+    # ── Storage ────────────────────────────────────────────────────────────
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest + ".zip")
+
+    def _read(self, entry):
+        try:
+            with open(self._blob_path(entry["sha256"]), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _store(self, key, params, payload, headers, settled):
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(self.blob_dir, exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        now = time.time()
+        self.index[key] = {
+            "sha256": digest,
+            "size": len(payload),
+            "fetched_at": now,
+            "accessed_at": now,
+            "settled": settled,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "query": {str(k): str(v) for k, v in params.items()},
+        }
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.index, f, separators=(",", ":"))
+        os.replace(tmp, self.index_path)
+
+    def prune(self):
+        """Evict least recently used entries until under max_bytes; drop orphan blobs"""
+        live, sizes = {}, {}
+        for key, entry in self.index.items():
+            live.setdefault(entry["sha256"], []).append(key)
+            sizes[entry["sha256"]] = entry["size"]
+        total = sum(sizes.values())
+
+        evicted = 0
+        for key in sorted(self.index, key=lambda k: self.index[k]["accessed_at"]):
+            if total <= self.max_bytes:
+                break
+            digest = self.index.pop(key)["sha256"]
+            live[digest].remove(key)
+            evicted += 1
+            if not live[digest]:
+                total -= sizes[digest]
+                del live[digest]
+
+        if os.path.isdir(self.blob_dir):
+            for name in os.listdir(self.blob_dir):
+                if name[:-4] not in live:
+                    os.remove(os.path.join(self.blob_dir, name))
+        return evicted
+
+    # ── Network ────────────────────────────────────────────────────────────
+    def _request(self, params, entry=None):
+        """(status, payload, headers); status 304 means the entry is still valid"""
+        url = self.base_url + "?" + urllib.parse.urlencode(params)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        for wait in RETRY_WAITS + (None,):
+            try:
+                with urllib.request.urlopen(urllib.request.Request(url, headers=headers),
+                                            timeout=REQUEST_TIMEOUT) as response:
+                    return response.status, response.read(), dict(response.headers)
+            except urllib.error.HTTPError as e:
+                if e.code == 304:
+                    return 304, None, dict(e.headers)
+                if e.code != 429 or wait is None:
+                    raise
+            time.sleep(wait)
+
+    def get(self, params):
+        """Zipped OASIS response for params, using the cache where valid"""
+        key = cache_key(params)
+        with self.lock:
+            entry = self.index.get(key)
+            payload = self._read(entry) if entry else None
+            if payload is not None:
+                fresh = time.time() - entry["fetched_at"] < RECENT_TTL_HOURS * 3600
+                if entry["settled"] or fresh:
+                    entry["accessed_at"] = time.time()
+                    self.hits += 1
+                    return payload
+
+        status, body, headers = self._request(params, entry if payload is not None else None)
+        if status != 304:
+            try:
+                check_payload(body)
+            except OasisError:
+                with self.lock:
+                    self.errors += 1
+                raise
+        with self.lock:
+            if payload is not None:
+                self.revalidated += 1
+                if status == 304 or hashlib.sha256(body).hexdigest() == entry["sha256"]:
+                    entry["fetched_at"] = entry["accessed_at"] = time.time()
+                    entry["settled"] = is_settled(params)
+                    return payload
+            else:
+                self.misses += 1
+            self._store(key, params, body, headers, is_settled(params))
+            self.prune()
+        return body
+
+    def stats(self):
+        blobs = {e["sha256"]: e["size"] for e in self.index.values()}
+        return {
+            "entries": len(self.index),
+            "settled": sum(1 for e in self.index.values() if e["settled"]),
+            "payloads": len(blobs),
+            "size_mb": round(sum(blobs.values()) / 1024 / 1024, 1),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "errors": self.errors,
+        }
+
+
+_default = None
+# fetch_planner calls get() from its worker threads; only one default cache may exist
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """The shared OasisCache behind get(), created on first use"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = OasisCache()
+        return _default
+
+
+def get(params):
+    """Cached OASIS request using the default cache (saved after every call)"""
+    cache = default_cache()
+    payload = cache.get(params)
+    cache.save()
+    return payload
+
+
+if __name__ == "__main__":
+    cache = OasisCache()
+    if "--prune" in sys.argv:
+        print(f"Evicted {cache.prune()} entries")
+        cache.save()
+    print(json.dumps(cache.stats(), indent=2))
@@ -0,0 +1,155 @@
+"""
+Cached per-year panel rendering for the year-faceted charts
+
+The *_by_year.png charts are 2x4 grids of year panels, and normally only the
+current year's data changes. Each panel is rendered on its own as a raster
+tile and cached under panel_cache/<chart>/, keyed by a hash of everything
+that affects its pixels: the data arrays, shared axis limits, labels and
+STYLE_VERSION. The figure is then assembled from tiles with PIL, plus a
+title strip and an optional right-hand strip (e.g. a colorbar), so a daily
+update re-renders one panel instead of seven. Shared limits and bin edges
+must be stable for that to hold: round them with nice_limit() before they go
+into a panel.
+
+Bump STYLE_VERSION whenever the panel drawing code changes.
+
+Usage:
+    cache = PanelCache("ru_vs_load_by_year")
+    tiles = [cache.tile(year, draw_year, year, x[year], y[year]) for year in years]
+    cache.save(path, compose(tiles, 4, title_strip("Title", width)))
+"""
+import os
+import glob
+import hashlib
+
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+from PIL import Image
+
+from chart_output import CHART_DPI, save_image
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(script_dir, "panel_cache")
+
+STYLE_VERSION = 1
+# Inches per panel; 4x2 panels reproduce the former 24x12 figure
+PANEL_SIZE = (6.0, 6.0)
+# Fixed margins so every tile's axes line up in the composed grid
+PANEL_MARGINS = dict(left=0.14, right=0.96, bottom=0.11, top=0.92)
+
+
+def nice_limit(value, fraction=0.25):
+    """Round value up to a multiple of fraction x its power of ten (122.6 -> 125)
+
+    Shared axis limits and bin edges go into every panel's cache key; rounding
+    them keeps the key of an unchanged year stable while new days arrive.
+    """
+    if value is None or not np.isfinite(value) or value <= 0:
+        return value
+    step = fraction * 10 ** np.floor(np.log10(value))
+    return round(float(np.ceil(value / step - 1e-9) * step), 10)
+
+
+def content_hash(*parts):
+    """Hash of arrays, numbers, strings and nested lists/tuples/dicts"""
+    digest = hashlib.sha256(f"style{STYLE_VERSION};mpl{matplotlib.__version__};".encode())
+
+    def feed(part):
+        if isinstance(part, np.ndarray):
+            digest.update(f"a{part.dtype}{part.shape};".encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        elif isinstance(part, dict):
+            digest.update(b"d")
+            for key in sorted(part):
+                feed(str(key))
+                feed(part[key])
+        elif isinstance(part, (list, tuple)):
+            digest.update(f"l{len(part)};".encode())
+            for item in part:
+                feed(item)
+        else:
+            digest.update(f"{type(part).__name__}:{part!r};".encode())
+
+    for part in parts:
+        feed(part)
+    return digest.hexdigest()[:20]
+
+
+def figure_to_image(fig, dpi=CHART_DPI):
+    """Rasterize a figure to an RGB PIL image and close it"""
+    fig.set_dpi(dpi)
+    fig.canvas.draw()
+    image = Image.fromarray(np.asarray(fig.canvas.buffer_rgba())).convert("RGB")
+    plt.close(fig)
+    return image
+
+
+def render_panel(draw, *args, facecolor="#1a1d2e", size=PANEL_SIZE, dpi=CHART_DPI):
+    """Render draw(ax, *args) on a single-panel figure and return the image"""
+    fig = plt.figure(figsize=size, dpi=dpi, facecolor=facecolor)
+    fig.subplots_adjust(**PANEL_MARGINS)
+    ax = fig.add_subplot(1, 1, 1)
+    draw(ax, *args)
+    return figure_to_image(fig, dpi)
+
+
+def blank_panel(facecolor="#1a1d2e", size=PANEL_SIZE, dpi=CHART_DPI):
+    return Image.new("RGB", (int(size[0] * dpi), int(size[1] * dpi)), facecolor)
+
+
+def title_strip(text, width_px, facecolor="#1a1d2e", color="#fff", fontsize=16,
+                height_in=0.9, dpi=CHART_DPI):
+    """Figure title rendered as a full-width strip"""
+    fig = plt.figure(figsize=(width_px / dpi, height_in), dpi=dpi, facecolor=facecolor)
+    fig.text(0.5, 0.5, text, ha="center", va="center", fontsize=fontsize,
+             fontweight="bold", color=color)
+    return figure_to_image(fig, dpi)
+
+
+def compose(tiles, ncols, title=None, right=None, facecolor="#1a1d2e"):
+    """Grid of equally sized tiles, with a title strip on top and a strip on the right"""
+    tile_w, tile_h = tiles[0].size
+    nrows = -(-len(tiles) // ncols)
+    grid_w, grid_h = tile_w * ncols, tile_h * nrows
+    title_h = title.size[1] if title else 0
+    right_w = right.size[0] if right else 0
+
+    canvas = Image.new("RGB", (grid_w + right_w, title_h + grid_h), facecolor)
+    if title:
+        canvas.paste(title, ((grid_w - title.size[0]) // 2, 0))
+    for i, tile in enumerate(tiles):
+        canvas.paste(tile, ((i % ncols) * tile_w, title_h + (i // ncols) * tile_h))
+    if right:
+        canvas.paste(right, (grid_w, title_h + (grid_h - right.size[1]) // 2))
+    return canvas
+
+
+class PanelCache:
+    """Tiles of one chart, cached as panel_cache/<chart>/<panel>-<hash>.png"""
+
+    def __init__(self, chart, root=CACHE_DIR):
+        self.dir = os.path.join(root, chart)
+        self.rendered = self.reused = 0
+        os.makedirs(self.dir, exist_ok=True)
+
+    def tile(self, panel, draw, *args, facecolor="#1a1d2e"):
+        """Cached image of draw(ax, *args) for panel (e.g. the year)"""
+        key = content_hash(panel, draw.__name__, args, facecolor)
+        path = os.path.join(self.dir, f"{panel}-{key}.png")
+        if os.path.exists(path):
+            self.reused += 1
+            with Image.open(path) as cached:
+                return cached.convert("RGB")
+
+        image = render_panel(draw, *args, facecolor=facecolor)
+        for stale in glob.glob(os.path.join(self.dir, f"{panel}-*.png")):
+            os.remove(stale)
+        image.save(path)
+        self.rendered += 1
+        return image
+
+    def save(self, path, image):
+        """Write the composed chart with the fixed chart metadata"""
+        save_image(path, image)
+        print(f"  Panels: {self.rendered} rendered, {self.reused} from cache")
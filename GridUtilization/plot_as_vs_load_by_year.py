@@ -0,0 +1,219 @@
+"""
+Plot ancillary service prices vs Load by year (2020-2026 Q1)
+Creates 4 charts (RU, RD, SR, NR), each with 6 subplots (one per year)
+Hourly data: each AS price plotted against hourly-averaged load for that hour
+"""
+import json
+import os
+import glob
+import numpy as np
+from datetime import datetime
+from collections import defaultdict
+
+import progress
+from binned_stats import yearly_binned_stats, draw_band, bands_to_dict, save_bands
+from fuel_schema import FUEL_INDEX, SchemaRegistry, read_fuel_day
+from quality_scan import load_flags, interval_mask
+from panel_cache import PanelCache, blank_panel, compose, nice_limit, title_strip
+from quantile_sketch import update_price_sketches
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+SUPPLY_DIR = os.path.join(script_dir, "caiso_supply")
+
+# Load ancillary services data
+print("Loading ancillary services data...")
+with open(os.path.join(script_dir, "ancillary_services.json")) as f:
+    as_data = json.load(f)
+
+# Calculate hourly-averaged load from CAISO supply data
+print("Calculating hourly-averaged load from CAISO supply data...")
+hourly_load = defaultdict(dict)  # {date: {hour: avg_load}}
+schema_registry = SchemaRegistry()
+# Intervals flagged by quality_scan.py (stuck, jumps, ...) are left out
+quality_flags = load_flags()
+
+files = sorted(glob.glob(os.path.join(SUPPLY_DIR, "*_fuelsource.csv")))
+print(f"Processing {len(files)} files...")
+
+for i, fpath in enumerate(files):
+    basename = os.path.basename(fpath)
+    date_str_raw = basename.split("_")[0]
+    try:
+        dt = datetime.strptime(date_str_raw, "%Y%m%d")
+    except ValueError:
+        continue
+
+    date_key = dt.strftime("%Y-%m-%d")
+
+    try:
+        day = read_fuel_day(fpath, schema_registry)
+    except Exception:
+        continue
+
+    # Gross demand: all generation (canonical columns, each counted once)
+    # minus battery charging
+    mw = np.nan_to_num(day.values)
+    gross_demand_mw = mw.sum(axis=1) - np.minimum(mw[:, FUEL_INDEX["batteries"]], 0)
+
+    # Calculate average for each hour over the intervals that passed the quality rules
+    valid = interval_mask(quality_flags, date_key, day.times)
+    counts = np.bincount(day.hours[valid], minlength=25)
+    sums = np.bincount(day.hours[valid], weights=gross_demand_mw[valid], minlength=25)
+    for hour in np.flatnonzero(counts):
+        hourly_load[date_key][str(hour)] = sums[hour] / counts[hour]
+
+    progress.report("hourly load", i + 1, len(files), unit="files")
+    if (i + 1) % 500 == 0:
+        print(f"  Processed {i+1}/{len(files)} files...")
+
+schema_registry.save()
+flagged = schema_registry.flagged()
+if flagged:
+    print(f"  Warning: {len(flagged)} fuelsource files rejected or with unknown columns "
+          f"(see {os.path.basename(schema_registry.path)})")
+
+print(f"Loaded hourly load data for {len(hourly_load)} days")
+
+# Parse hourly data by year
+print("Parsing hourly data by year...")
+data_by_year = {year: {'ru': [], 'rd': [], 'sr': [], 'nr': [], 'load': []}
+                for year in range(2020, 2027)}
+
+for date_str, hourly_as in as_data.items():
+    try:
+        dt = datetime.strptime(date_str, "%Y-%m-%d")
+        year = dt.year
+
+        if year not in data_by_year:
+            continue
+
+        # Get hourly load data for this date
+        load_by_hour = hourly_load.get(date_str, {})
+
+        # Process each hour
+        for hour, as_values in hourly_as.items():
+            if not isinstance(as_values, dict):
+                continue
+
+            # Get AS prices for this hour
+            ru = as_values.get('RU', None)
+            rd = as_values.get('RD', None)
+            sr = as_values.get('SR', None)
+            nr = as_values.get('NR', None)
+
+            # Get load for this hour
+            load = load_by_hour.get(hour, None)
+
+            # Store if all values present
+            if all(v is not None for v in [ru, rd, sr, nr, load]):
+                data_by_year[year]['ru'].append(ru)
+                data_by_year[year]['rd'].append(rd)
+                data_by_year[year]['sr'].append(sr)
+                data_by_year[year]['nr'].append(nr)
+                data_by_year[year]['load'].append(load / 1000.0)  # Convert to GW
+
+    except (ValueError, KeyError):
+        continue
+
+print("Data loaded successfully")
+for year in range(2020, 2027):
+    print(f"  {year}: {len(data_by_year[year]['ru']):,} hourly data points")
+
+# Calculate global y-axis limits for each AS type (99th percentile across all years)
+# from the persisted quantile sketches, which only fold in days not seen before
+print("\nCalculating global y-axis limits...")
+sketches = update_price_sketches(as_data)
+global_limits = {}
+for as_key in ['ru', 'rd', 'sr', 'nr']:
+    p99 = sketches.quantile(as_key, 0.99, years=range(2020, 2027))
+    if p99 is not None:
+        # Rounded up to a fixed step so a new day rarely moves the limit
+        # (shared limits are part of every cached panel's key)
+        global_limits[as_key] = nice_limit(p99)
+        print(f"  {as_key.upper()}: 0 to {global_limits[as_key]:.1f} $/MWh")
+    else:
+        global_limits[as_key] = 100
+
+# Binned median and P10-P90 of each A/S price conditional on load, per year
+LOAD_EDGES = np.arange(15, 60.1, 2.5)
+bands = {as_key: yearly_binned_stats(data_by_year, 'load', as_key, LOAD_EDGES)
+         for as_key in ['ru', 'rd', 'sr', 'nr']}
+save_bands(os.path.join(script_dir, "as_vs_load_bands.json"),
+           {as_key: bands_to_dict(LOAD_EDGES, by_year) for as_key, by_year in bands.items()})
+
+# Style constants
+BG_COLOR = "#1a1d2e"
+TEXT_COLOR = "#e2e8f0"
+GRID_COLOR = "#2a2d3e"
+SPINE_COLOR = "#3a3d4e"
+BAND_COLOR = "#ffffff"
+
+# Create charts for each AS type
+as_types = [
+    ('ru', 'Regulation Up (RU)', '#60a5fa'),
+    ('rd', 'Regulation Down (RD)', '#4ade80'),
+    ('sr', 'Spinning Reserve (SR)', '#facc15'),
+    ('nr', 'Non-Spinning Reserve (NR)', '#f97316')
+]
+
+def draw_year(ax, year, load_values, as_prices, band, as_title, as_color, y_limit, show_ylabel):
+    """One year panel (rendered into a cached tile)"""
+    ax.set_facecolor(BG_COLOR)
+    if len(as_prices) == 0:
+        return
+
+    # Cap AS prices at global limit
+    as_prices_capped = np.clip(as_prices, 0, y_limit)
+
+    # Scatter plot
+    ax.scatter(load_values, as_prices_capped,
+              c=as_color, s=3, alpha=0.4, edgecolors='none', rasterized=True)
+    draw_band(ax, LOAD_EDGES, band, BAND_COLOR)
+
+    ax.set_title(f"{year}", fontsize=14, fontweight='bold', color='#fff', pad=10)
+    ax.set_xlabel("Hourly-Averaged Load (GW)", fontsize=11, color=TEXT_COLOR)
+
+    if show_ylabel:
+        ax.set_ylabel(f"{as_title} Price ($/MWh)", fontsize=11, color=TEXT_COLOR, fontweight='bold')
+
+    # Set consistent limits across all subplots
+    ax.set_xlim(15, 60)
+    ax.set_ylim(0, y_limit)
+
+    ax.grid(True, color=GRID_COLOR, linewidth=0.5, alpha=0.5)
+    ax.tick_params(colors=TEXT_COLOR, labelsize=9)
+
+    for spine in ax.spines.values():
+        spine.set_color(SPINE_COLOR)
+
+    # Add sample size
+    ax.text(0.02, 0.98, f"n={len(as_prices):,}",
+           transform=ax.transAxes, fontsize=9, color=TEXT_COLOR,
+           verticalalignment='top', alpha=0.7)
+
+
+for as_key, as_title, as_color in as_types:
+    print(f"\nCreating chart for {as_title}...")
+
+    # Year panels come from the tile cache; only changed years are redrawn
+    cache = PanelCache(f"{as_key}_vs_load_by_year")
+    years = list(range(2020, 2027))
+    tiles = []
+    for idx, year in enumerate(years):
+        tiles.append(cache.tile(year, draw_year, year,
+                                np.array(data_by_year[year]['load']),
+                                np.array(data_by_year[year][as_key]),
+                                bands[as_key][year], as_title, as_color,
+                                global_limits[as_key], idx % 3 == 0,
+                                facecolor=BG_COLOR))
+    # Unused slot (2027 has no data yet)
+    tiles.append(blank_panel(BG_COLOR))
+
+    title = title_strip(f"{as_title} Price vs. Hourly-Averaged Load by Year (2020-2026 Q1)\n"
+                        f"Hourly Data (line: binned median, band: P10-P90)",
+                        tiles[0].size[0] * 4, facecolor=BG_COLOR)
+    out_path = os.path.join(script_dir, f"{as_key}_vs_load_by_year.png")
+    cache.save(out_path, compose(tiles, 4, title, facecolor=BG_COLOR))
+    print(f"Saved to {out_path}")
+
+print("\nAll Load charts created successfully!")
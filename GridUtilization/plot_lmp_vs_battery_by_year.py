@@ -0,0 +1,171 @@
+"""
+Scatter plots showing relationship between battery discharge (GW) and peak LMP prices.
+One subplot per year (2020-2025), colored by battery % of peak demand.
+"""
+import json
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
+from datetime import datetime
+
+from binned_stats import yearly_binned_stats, draw_band, bands_to_dict, save_bands
+from chart_output import CHART_DPI
+from panel_cache import PanelCache, blank_panel, compose, figure_to_image, nice_limit, title_strip
+from quantile_sketch import update_price_sketches
+
+# ── Load data ──────────────────────────────────────────────────────────────
+with open("caiso_battery_daily_peak_mw.json") as f:
+    daily_peak_mw_raw = json.load(f)
+
+with open("caiso_battery_daily_peak.json") as f:
+    daily_peak_pct_raw = json.load(f)
+
+with open("caiso_prices.json") as f:
+    price_data = json.load(f)
+
+# ── Daily peak battery GW and % ───────────────────────────────────────────
+peak_bat_dates = [datetime.strptime(d, "%Y-%m-%d") for d in sorted(daily_peak_mw_raw.keys())]
+peak_bat_mw = [daily_peak_mw_raw[d] for d in sorted(daily_peak_mw_raw.keys())]
+peak_bat_gw = [mw / 1000.0 for mw in peak_bat_mw]  # Convert MW to GW
+peak_bat_pct = [daily_peak_pct_raw.get(d, 0) for d in sorted(daily_peak_mw_raw.keys())]
+
+# ── Daily peak LMP ───────────────────────────────────────────────────────
+daily_peak_lmp = {}
+for date_str, hours_dict in price_data.items():
+    if not isinstance(hours_dict, dict):
+        continue
+    dt = datetime.strptime(date_str, "%Y-%m-%d")
+    for h_str, vals in hours_dict.items():
+        if isinstance(vals, dict) and "LMP" in vals:
+            lmp = vals["LMP"]
+            if dt not in daily_peak_lmp or lmp > daily_peak_lmp[dt]:
+                daily_peak_lmp[dt] = lmp
+
+# ── Match up dates and organize by year ───────────────────────────────────
+data_by_year = {year: {'gw': [], 'pct': [], 'lmp': []} for year in range(2020, 2027)}
+
+for i, date in enumerate(peak_bat_dates):
+    if date in daily_peak_lmp:
+        year = date.year
+        if year in data_by_year:
+            data_by_year[year]['gw'].append(peak_bat_gw[i])
+            data_by_year[year]['pct'].append(peak_bat_pct[i])
+            data_by_year[year]['lmp'].append(daily_peak_lmp[date])
+
+# Convert to numpy arrays
+for year in data_by_year:
+    data_by_year[year]['gw'] = np.array(data_by_year[year]['gw'])
+    data_by_year[year]['pct'] = np.array(data_by_year[year]['pct'])
+    data_by_year[year]['lmp'] = np.array(data_by_year[year]['lmp'])
+    print(f"{year}: {len(data_by_year[year]['gw'])} days")
+
+# ── Calculate global ranges for consistent axes ───────────────────────────
+max_gw = max(data_by_year[y]['gw'].max() for y in range(2020, 2027) if len(data_by_year[y]['gw']))
+max_pct = max(data_by_year[y]['pct'].max() for y in range(2020, 2027) if len(data_by_year[y]['pct']))
+
+# p99 of daily peak LMP from the persisted quantile sketches (no pooled raw values)
+sketches = update_price_sketches({}, price_data)
+lmp_p99 = sketches.quantile("lmp_daily_peak", 0.99, years=range(2020, 2027))
+if lmp_p99 is None:
+    # No complete days in the sketch yet: fall back to the loaded peak LMPs
+    pooled = np.concatenate([data_by_year[y]['lmp'] for y in range(2020, 2027)])
+    lmp_p99 = float(np.percentile(pooled, 99)) if len(pooled) else 100.0
+
+# Shared limits rounded up to a fixed step: they are part of every cached
+# panel's key, so a new day should only move them when it crosses a step
+gw_limit = nice_limit(max_gw * 1.05)
+lmp_y_limit = nice_limit(lmp_p99 * 1.1)
+
+print("\nGlobal ranges:")
+print(f"  Battery GW: 0-{max_gw:.2f}")
+print(f"  Battery %: 0-{max_pct:.1f}%")
+print(f"  LMP (p99): ${lmp_p99:.1f}")
+print(f"  Axes: 0-{gw_limit:g} GW, 0-{lmp_y_limit:g} $/MWh")
+
+# ── Binned median and P10-P90 of peak LMP conditional on battery GW ─────────
+GW_EDGES = np.linspace(0, nice_limit(max_gw), 16)
+bands = yearly_binned_stats(data_by_year, 'gw', 'lmp', GW_EDGES, min_count=10)
+save_bands("lmp_vs_battery_bands.json", {"lmp": bands_to_dict(GW_EDGES, bands)})
+
+# ── Style constants ───────────────────────────────────────────────────────
+BG_COLOR = "#1a1d2e"
+TEXT_COLOR = "#e2e8f0"
+GRID_COLOR = "#2a2d3e"
+SPINE_COLOR = "#334155"
+BAND_COLOR = "#ffffff"
+
+# Colormap for battery % (plasma: purple -> yellow)
+pct_cmap = plt.cm.plasma
+pct_norm = mcolors.Normalize(vmin=0, vmax=100)
+
+# ══════════════════════════════════════════════════════════════════════════
+# Year panels (cached tiles) composed into a 2x4 grid
+# ══════════════════════════════════════════════════════════════════════════
+def draw_year(ax, year, gw, pct, lmp, band, x_limit, y_limit, show_xlabel, show_ylabel):
+    ax.set_facecolor(BG_COLOR)
+
+    if len(gw) > 0:
+        ax.scatter(gw, lmp,
+                   c=pct, cmap=pct_cmap, norm=pct_norm,
+                   s=20, alpha=0.6, edgecolors="none", rasterized=True)
+        draw_band(ax, GW_EDGES, band, BAND_COLOR)
+
+    # Axis labels
+    if show_xlabel:  # Bottom row
+        ax.set_xlabel("Daily Peak Battery Discharge (GW)",
+                     fontsize=11, color=TEXT_COLOR, fontweight="bold")
+    if show_ylabel:  # Left column
+        ax.set_ylabel("Daily Peak LMP ($/MWh)",
+                     fontsize=11, color=TEXT_COLOR, fontweight="bold")
+
+    # Title for each subplot
+    ax.set_title(f"{year}", fontsize=13, fontweight="bold", color="#fff", pad=10)
+
+    # Set consistent ranges
+    ax.set_xlim(-0.2, x_limit)
+    ax.set_ylim(0, y_limit)
+
+    # Grid and styling
+    ax.grid(True, color=GRID_COLOR, linewidth=0.5, alpha=0.4)
+    ax.tick_params(colors=TEXT_COLOR, labelsize=9)
+
+    for spine in ax.spines.values():
+        spine.set_color(SPINE_COLOR)
+
+    # Add data count
+    ax.text(0.02, 0.98, f"n={len(gw)}", transform=ax.transAxes,
+            fontsize=9, color="#888", va='top', ha='left')
+
+
+def colorbar_strip(height_px):
+    """Single colorbar for all panels, as a strip to the right of the grid"""
+    fig = plt.figure(figsize=(1.4, height_px / CHART_DPI * 0.7), facecolor=BG_COLOR)
+    cbar_ax = fig.add_axes([0.15, 0.02, 0.18, 0.96])
+    sm = plt.cm.ScalarMappable(cmap=pct_cmap, norm=pct_norm)
+    sm.set_array([])
+    cbar = fig.colorbar(sm, cax=cbar_ax)
+    cbar.set_label("Battery % of Peak Demand", fontsize=12, color=TEXT_COLOR, fontweight="bold")
+    cbar.set_ticks([0, 20, 40, 60, 80, 100])
+    cbar.ax.tick_params(colors=TEXT_COLOR, labelsize=10)
+    cbar.outline.set_edgecolor(SPINE_COLOR)
+    return figure_to_image(fig)
+
+
+cache = PanelCache("lmp_vs_battery_by_year")
+tiles = []
+for idx, year in enumerate(range(2020, 2027)):
+    tiles.append(cache.tile(year, draw_year, year,
+                            data_by_year[year]['gw'], data_by_year[year]['pct'],
+                            data_by_year[year]['lmp'], bands[year],
+                            gw_limit, lmp_y_limit, idx >= 3, idx % 3 == 0,
+                            facecolor=BG_COLOR))
+# Unused slot (2027 has no data yet)
+tiles.append(blank_panel(BG_COLOR))
+
+title = title_strip("Peak Electricity Price vs Battery Storage Capacity by Year\n"
+                    "Color = Battery as % of Peak Demand (line: binned median, band: P10-P90)",
+                    tiles[0].size[0] * 4, facecolor=BG_COLOR)
+colorbar = colorbar_strip(tiles[0].size[1] * 2)
+cache.save("lmp_vs_battery_by_year.png", compose(tiles, 4, title, colorbar, facecolor=BG_COLOR))
+print("\nSaved lmp_vs_battery_by_year.png")
+print("Visualization complete!")
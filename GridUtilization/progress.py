@@ -0,0 +1,120 @@
+"""
+Structured progress events for long-running pipeline scripts
+
+Child scripts call report() to emit JSON-lines events (stage, items done and
+total, plus any extra counters) on a side channel: the file named by the
+CAISO_PROGRESS_FILE environment variable. daily_update.py sets that variable
+for every step, tails the file while the step runs and prints throughput and
+ETA. When the variable is not set (script run by hand) report() does nothing.
+"""
+import os
+import json
+import time
+
+PROGRESS_ENV = "CAISO_PROGRESS_FILE"
+
+# Minimum seconds between two events of the same stage (final event always sent)
+MIN_INTERVAL = 0.5
+
+_last_emit = {}
+
+
+def report(stage, done, total=None, **fields):
+    """Emit one progress event for a stage (no-op outside daily_update.py)"""
+    path = os.environ.get(PROGRESS_ENV)
+    if not path:
+        return
+
+    now = time.time()
+    finished = total is not None and done >= total
+    if not finished and now - _last_emit.get(stage, 0) < MIN_INTERVAL:
+        return
+    _last_emit[stage] = now
+
+    event = {"t": round(now, 3), "stage": stage, "done": done}
+    if total is not None:
+        event["total"] = total
+    event.update(fields)
+
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event) + "\n")
+    except OSError:
+        pass  # Progress is best-effort; never fail the script over it
+
+
+class ProgressTail:
+    """Incrementally read new events from a progress file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.partial = ""
+
+    def read(self):
+        """Return events appended since the last call"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                f.seek(self.offset)
+                chunk = f.read()
+                self.offset = f.tell()
+        except OSError:
+            return []
+
+        lines = (self.partial + chunk).split("\n")
+        self.partial = lines.pop()  # Incomplete last line, finish next time
+
+        events = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+        return events
+
+
+class ProgressTracker:
+    """Per-stage throughput and ETA computed from a stream of events"""
+
+    def __init__(self):
+        self.stages = {}  # {stage: (first_time, first_done)}
+
+    def describe(self, event):
+        """Format an event as a one-line status with rate and ETA"""
+        stage = event.get("stage", "?")
+        done = event.get("done", 0)
+        total = event.get("total")
+        t = event.get("t", time.time())
+
+        first_t, first_done = self.stages.setdefault(stage, (t, done))
+        elapsed = t - first_t
+        rate = (done - first_done) / elapsed if elapsed > 0 else 0.0
+
+        unit = event.get("unit", "items")
+        if total:
+            text = f"{stage}: {done:,}/{total:,} {unit} ({100 * done / total:.0f}%)"
+        else:
+            text = f"{stage}: {done:,} {unit}"
+
+        if rate > 0:
+            text += f" · {rate:,.1f} {unit}/s"
+            if total and done < total:
+                text += f" · ETA {format_duration((total - done) / rate)}"
+
+        extras = {k: v for k, v in event.items()
+                  if k not in ("t", "stage", "done", "total", "unit")}
+        if extras:
+            text += " · " + ", ".join(f"{k}={v}" for k, v in extras.items())
+        return text
+
+
+def format_duration(seconds):
+    """Format seconds as M:SS or H:MM:SS"""
+    seconds = int(round(seconds))
+    hours, rem = divmod(seconds, 3600)
+    minutes, secs = divmod(rem, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
@@ -0,0 +1,242 @@
+"""
+Vectorized data-quality scanner for the 5-minute fuelsource history
+
+Runs rule checks over every fuel column of the supply history and writes a
+per-day report (quality_report.json). Rules:
+
+  - interval count: rows per day vs the expected count for that local day
+    (288, or 276 / 300 on DST transition days, America/Los_Angeles)
+  - gaps: missing intervals, and missing values in the core fuel columns
+  - negative solar: solar below SOLAR_FLOOR_MW
+  - stuck values: the same reading for STUCK_INTERVALS+ consecutive intervals
+    in a normally variable column
+  - impossible jumps: interval-to-interval change above JUMP_LIMITS_MW
+
+All days to scan are stacked into one (n_intervals, n_fuels) array and each
+rule is a handful of array operations; stuck and jump checks only compare
+intervals that are exactly 5 minutes apart, and use the previous day as
+context so runs across midnight are caught. Only days whose file changed
+since the last scan are rescanned.
+
+Flagged interval times are stored per day; downstream load, ramp and profile
+aggregates load them with load_flags() and drop intervals with interval_mask().
+Only MASK_RULES (missing core values, impossible jumps) drop an interval by
+default: those corrupt the sum over fuels. A stuck or slightly negative
+column is reported but its interval is kept.
+
+Usage:
+    python quality_scan.py           # scan new/changed days
+    python quality_scan.py --full    # rescan everything
+    python quality_scan.py --dates 2026-03-01,2026-03-02   # only these new days
+"""
+import os
+import sys
+import json
+import time
+from datetime import datetime, time as dtime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from fuel_schema import (FUEL_INDEX, SchemaRegistry, dates_arg, file_fingerprint,
+                         minutes_of_day, read_supply_days, supply_files)
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+REPORT_FILE = os.path.join(script_dir, "quality_report.json")
+
+CAISO_TZ = ZoneInfo("America/Los_Angeles")
+INTERVAL_MINUTES = 5
+
+# Night-time solar is slightly negative (station load); below this it is bad data
+SOLAR_FLOOR_MW = -200
+# Consecutive identical readings (3 hours) that count as a stuck meter
+STUCK_INTERVALS = 36
+STUCK_FUELS = ["solar", "wind", "natural_gas", "large_hydro", "imports"]
+# Solar is legitimately flat at night; only check it above this output
+STUCK_SOLAR_MIN_MW = 100
+# Largest plausible change over one 5-minute interval
+JUMP_LIMITS_MW = {
+    "solar": 3000,
+    "wind": 1500,
+    "natural_gas": 3000,
+    "nuclear": 1200,
+    "large_hydro": 2000,
+    "batteries": 5000,
+    "imports": 3000,
+}
+CORE_FUELS = ["solar", "wind", "natural_gas", "nuclear", "large_hydro", "imports"]
+
+# Interval flag bits
+FLAG_MISSING = 1
+FLAG_NEGATIVE_SOLAR = 2
+FLAG_STUCK = 4
+FLAG_JUMP = 8
+FLAG_NAMES = {FLAG_MISSING: "missing", FLAG_NEGATIVE_SOLAR: "negative_solar",
+              FLAG_STUCK: "stuck", FLAG_JUMP: "jump"}
+# Flags that drop an interval from load / net-load aggregates
+MASK_RULES = FLAG_MISSING | FLAG_JUMP
+
+
+def expected_intervals(day):
+    """5-minute intervals in the local (Pacific) calendar day"""
+    # Same-zone aware subtraction ignores DST, so compare in UTC
+    start = datetime.combine(day, dtime(0), tzinfo=CAISO_TZ).astimezone(timezone.utc)
+    end = datetime.combine(day + timedelta(days=1), dtime(0), tzinfo=CAISO_TZ).astimezone(timezone.utc)
+    return int((end - start).total_seconds() // 60 // INTERVAL_MINUTES)
+
+
+def run_mask(cond, min_len):
+    """True for elements inside runs of True at least min_len long"""
+    edges = np.diff(np.concatenate(([0], cond.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    long = (ends - starts) >= min_len
+    marks = np.zeros(len(cond) + 1, dtype=np.int64)
+    np.add.at(marks, starts[long], 1)
+    np.add.at(marks, ends[long], -1)
+    return np.cumsum(marks[:-1]) > 0
+
+
+def scan(values, contiguous):
+    """Per-interval flag bits for stacked intervals
+
+    values: (n, n_fuels) MW array in CANONICAL_FUELS order.
+    contiguous: bool (n,), True where the interval follows the previous one
+    by exactly 5 minutes.
+    """
+    n = len(values)
+    flags = np.zeros(n, dtype=np.uint8)
+
+    core = [FUEL_INDEX[f] for f in CORE_FUELS]
+    flags[np.isnan(values[:, core]).any(axis=1)] |= FLAG_MISSING
+
+    solar = values[:, FUEL_INDEX["solar"]]
+    flags[solar < SOLAR_FLOOR_MW] |= FLAG_NEGATIVE_SOLAR
+
+    with np.errstate(invalid="ignore"):
+        step = np.zeros_like(values)
+        step[1:] = values[1:] - values[:-1]
+        step[~contiguous] = np.nan
+
+        for fuel, limit in JUMP_LIMITS_MW.items():
+            flags[np.abs(step[:, FUEL_INDEX[fuel]]) > limit] |= FLAG_JUMP
+
+        for fuel in STUCK_FUELS:
+            column = values[:, FUEL_INDEX[fuel]]
+            same = (step[:, FUEL_INDEX[fuel]] == 0)
+            if fuel == "solar":
+                same &= column > STUCK_SOLAR_MIN_MW
+            # A run of k "same as previous" intervals spans k + 1 readings
+            stuck = run_mask(same, STUCK_INTERVALS - 1)
+            stuck[:-1] |= stuck[1:] & ~stuck[:-1]
+            flags[stuck] |= FLAG_STUCK
+    return flags
+
+
+def load_report(path=REPORT_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_report(report, path=REPORT_FILE):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(dict(sorted(report.items())), f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def run(full=False, dates=None):
+    """Scan new/changed days and update the report; returns days scanned
+
+    dates: when given, only these days and days already in the report are
+    considered (scanned or used as context).
+    """
+    files = supply_files()
+    report = {} if full else load_report()
+    if dates is not None:
+        files = {d: p for d, p in files.items() if d in dates or d.isoformat() in report}
+    todo = sorted(d for d, p in files.items()
+                  if report.get(d.isoformat(), {}).get("source") != file_fingerprint(p))
+    if not todo:
+        print(f"Quality report up to date ({len(report)} days)")
+        return 0
+
+    # Previous days are read as context only, for runs across midnight
+    todo_set = set(todo)
+    scan_days = sorted(todo_set | {d - timedelta(days=1) for d in todo
+                                   if d - timedelta(days=1) in files})
+    registry = SchemaRegistry()
+    errors = {}
+    days = read_supply_days(scan_days, files, registry, "quality scan", errors)
+    registry.save()
+    for d, message in errors.items():
+        if d in todo_set:
+            report[d.isoformat()] = {"source": file_fingerprint(files[d]), "error": message}
+    if not days:
+        # Keep the error entries, so unchanged unreadable files are not retried
+        save_report(report)
+        print("No readable fuelsource files to scan")
+        return 0
+
+    values = np.vstack([day.values for _, day in days])
+    absolute = np.concatenate([d.toordinal() * 1440 + minutes_of_day(day.times)
+                               for d, day in days])
+    contiguous = np.zeros(len(absolute), dtype=bool)
+    contiguous[1:] = np.diff(absolute) == INTERVAL_MINUTES
+    flags = scan(values, contiguous)
+
+    offset = 0
+    for d, day in days:
+        n = len(day.times)
+        day_flags = flags[offset:offset + n]
+        offset += n
+        if d not in todo_set:
+            continue
+        expected = expected_intervals(d)
+        entry = {
+            "source": file_fingerprint(files[d]),
+            "intervals": n,
+            "expected": expected,
+            "interval_count_ok": n == expected,
+            "missing_intervals": max(expected - n, 0),
+            "flagged_intervals": int(np.count_nonzero(day_flags)),
+        }
+        for bit, name in FLAG_NAMES.items():
+            entry[name] = int(np.count_nonzero(day_flags & bit))
+        entry["flagged"] = {day.times[i]: int(day_flags[i]) for i in np.flatnonzero(day_flags)}
+        report[d.isoformat()] = entry
+
+    save_report(report)
+
+    bad_days = [k for k in todo_set if not report[k.isoformat()].get("interval_count_ok", False)
+                or report[k.isoformat()].get("flagged_intervals")]
+    print(f"Scanned {len(todo)} days ({len(values):,} intervals): "
+          f"{int(np.count_nonzero(flags))} flagged intervals, {len(bad_days)} days with issues")
+    return len(todo)
+
+
+def load_flags(path=REPORT_FILE):
+    """{date: {time: flag bits}} of flagged intervals (empty if no report)"""
+    return {d: entry.get("flagged", {}) for d, entry in load_report(path).items()
+            if entry.get("flagged")}
+
+
+def interval_mask(flags, date_key, times, rules=MASK_RULES):
+    """Bool array, True for intervals of date_key without any of the rules' flags"""
+    flagged = flags.get(date_key)
+    if not flagged:
+        return np.ones(len(times), dtype=bool)
+    return np.array([not flagged.get(t, 0) & rules for t in times], dtype=bool)
+
+
+def main():
+    start = time.time()
+    run(full="--full" in sys.argv, dates=dates_arg(sys.argv))
+    print(f"Done in {time.time() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
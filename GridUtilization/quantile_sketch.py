@@ -0,0 +1,311 @@
+"""
+Mergeable streaming quantile sketches (t-digest) for price distributions
+
+A TDigest answers approximate quantile queries (p50/p90/p99, ...) from about
+a hundred weighted centroids, can be updated incrementally with numpy arrays
+and merged with other digests. Centroids are small near both tails, so p99
+axis limits stay accurate. SketchStore keeps one digest per (series, year,
+hour of day) in quantile_sketches.json so charts can get axis limits and
+hour-of-day distribution bands without holding every raw value in memory.
+
+Compression is a pure function of the input, so the same data always gives
+the same digest (and the same chart limits). Centroids are saved at full
+precision, so a reloaded digest answers exactly like the one that was saved.
+"""
+import os
+import json
+import hashlib
+from datetime import date, datetime
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+SKETCH_FILE = os.path.join(script_dir, "quantile_sketches.json")
+
+DEFAULT_COMPRESSION = 200
+
+# Ancillary service series kept in the store (lower-case keys of ancillary_services.json)
+AS_SERIES = ("ru", "rd", "sr", "nr")
+
+
+class TDigest:
+    """Merging t-digest with the arcsine (k1) scale function"""
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.n = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _compress(self, means, weights):
+        """Sort centroids and merge neighbours that fall in the same k-bucket"""
+        order = np.argsort(means, kind="stable")
+        means = means[order]
+        weights = weights[order]
+        total = weights.sum()
+
+        q_mid = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q_mid - 1)
+        bucket = np.floor(k).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+
+        merged_w = np.add.reduceat(weights, starts)
+        merged_m = np.add.reduceat(means * weights, starts) / merged_w
+        self.means = merged_m
+        self.weights = merged_w
+        self.n = float(total)
+
+    def update(self, value):
+        """Add a single value"""
+        self.update_many([value])
+
+    def update_many(self, values):
+        """Add an array of values (NaNs are ignored)"""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(np.concatenate([self.means, values]),
+                       np.concatenate([self.weights, np.ones(values.size)]))
+
+    def merge(self, other):
+        """Fold another digest into this one (in place) and return self"""
+        if other.n == 0:
+            return self
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]),
+                       np.concatenate([self.weights, other.weights]))
+        return self
+
+    def quantiles(self, qs):
+        """Approximate values at quantiles qs (each between 0 and 1)"""
+        if self.n == 0:
+            return [None for _ in qs]
+        # Interpolate between centroid centres, anchored at the exact min/max
+        centres = np.cumsum(self.weights) - self.weights / 2
+        xp = np.r_[0.0, centres, self.n]
+        fp = np.r_[self.min, self.means, self.max]
+        return [float(v) for v in np.interp(np.asarray(qs, dtype=float) * self.n, xp, fp)]
+
+    def quantile(self, q):
+        """Approximate value at quantile q"""
+        return self.quantiles([q])[0]
+
+    def to_dict(self):
+        return {
+            "n": self.n,
+            "min": self.min if self.n else None,
+            "max": self.max if self.n else None,
+            # Full precision: rounding here would make a reloaded digest give
+            # different quantiles than the in-memory one that was saved
+            "means": [float(v) for v in self.means],
+            "weights": [float(w) for w in self.weights],
+        }
+
+    @classmethod
+    def from_dict(cls, data, compression=DEFAULT_COMPRESSION):
+        digest = cls(compression)
+        digest.n = float(data.get("n", 0))
+        if digest.n:
+            digest.min = data["min"]
+            digest.max = data["max"]
+            digest.means = np.asarray(data["means"], dtype=float)
+            digest.weights = np.asarray(data["weights"], dtype=float)
+        return digest
+
+
+class SketchStore:
+    """Persisted sketches keyed by series, year and hour of day
+
+    Each series records a fingerprint of every date folded in, so re-running
+    a chart only adds days it has not seen. Only complete days (before today)
+    are ingested. A digest cannot forget values, so when a known day's values
+    change (e.g. OASIS revises prices) the series is rebuilt from the days
+    passed in.
+    """
+
+    def __init__(self, path=SKETCH_FILE, compression=DEFAULT_COMPRESSION):
+        self.path = path
+        self.compression = compression
+        self.series = {}  # {series: {"dates": {date: fingerprint}, "sketches": {year: {hour: TDigest}}}}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path=SKETCH_FILE, compression=DEFAULT_COMPRESSION):
+        store = cls(path, compression)
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    raw = json.load(f)
+            except (OSError, ValueError):
+                raw = {}
+            if raw.get("compression") == compression:
+                for name, entry in raw.get("series", {}).items():
+                    dates = entry.get("dates", {})
+                    if isinstance(dates, list):
+                        # Stores written before fingerprints were kept
+                        dates = dict.fromkeys(dates)
+                    store.series[name] = {
+                        "dates": dates,
+                        "sketches": {
+                            year: {hour: TDigest.from_dict(s, compression) for hour, s in hours.items()}
+                            for year, hours in entry.get("sketches", {}).items()
+                        },
+                    }
+        return store
+
+    def save(self):
+        """Write the store back to disk if anything changed"""
+        if not self.dirty:
+            return
+        raw = {
+            "compression": self.compression,
+            "series": {
+                name: {
+                    "dates": dict(sorted(entry["dates"].items())),
+                    "sketches": {
+                        year: {hour: s.to_dict() for hour, s in sorted(hours.items())}
+                        for year, hours in sorted(entry["sketches"].items())
+                    },
+                }
+                for name, entry in sorted(self.series.items())
+            },
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(raw, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def _entry(self, series):
+        return self.series.setdefault(series, {"dates": {}, "sketches": {}})
+
+    def add_days(self, series, days):
+        """Fold complete days of {date: {hour: values}} into the series
+
+        Pass every known day: days already ingested with the same values, or
+        not complete yet (today and later), are skipped. If a known day's
+        values changed, the series is rebuilt from days. Values are batched
+        per (year, hour) so each digest is compressed once per call. Returns
+        the number of days added.
+        """
+        entry = self._entry(series)
+        today = date.today().isoformat()
+        complete = {d: v for d, v in days.items() if d < today}
+        prints = {d: day_fingerprint(v) for d, v in complete.items()}
+
+        # Unknown fingerprints (older stores) are taken as unchanged
+        known = entry["dates"]
+        if any(d in known and known[d] is not None and known[d] != fp
+               for d, fp in prints.items()):
+            entry = self.series[series] = {"dates": {}, "sketches": {}}
+            self.dirty = True
+        for d, fp in prints.items():
+            if d in entry["dates"] and entry["dates"][d] is None:
+                entry["dates"][d] = fp
+                self.dirty = True
+
+        batches = {}  # {(year, hour): [arrays]}
+        added = 0
+        for date_str, hourly_values in complete.items():
+            if date_str in entry["dates"]:
+                continue
+            for hour, values in hourly_values.items():
+                batches.setdefault((date_str[:4], str(hour)), []).append(np.atleast_1d(values))
+            entry["dates"][date_str] = prints[date_str]
+            added += 1
+
+        for (year, hour), arrays in batches.items():
+            year_sketches = entry["sketches"].setdefault(year, {})
+            sketch = year_sketches.get(hour)
+            if sketch is None:
+                sketch = year_sketches[hour] = TDigest(self.compression)
+            sketch.update_many(np.concatenate(arrays).astype(float))
+        if added:
+            self.dirty = True
+        return added
+
+    def sketch(self, series, years=None, hours=None):
+        """Merged sketch over the selected years and hours (default: all)"""
+        merged = TDigest(self.compression)
+        sketches = self._entry(series)["sketches"]
+        for year, year_sketches in sketches.items():
+            if years is not None and int(year) not in years:
+                continue
+            for hour, s in year_sketches.items():
+                if hours is not None and hour not in {str(h) for h in hours}:
+                    continue
+                merged.merge(s)
+        return merged
+
+    def quantile(self, series, q, years=None, hours=None):
+        return self.sketch(series, years, hours).quantile(q)
+
+    def hourly_bands(self, series, qs=(0.1, 0.5, 0.9), years=None):
+        """{hour: [values at qs]} hour-of-day distribution bands"""
+        hours = set()
+        for year, year_sketches in self._entry(series)["sketches"].items():
+            if years is None or int(year) in years:
+                hours.update(year_sketches)
+        return {hour: self.sketch(series, years, [hour]).quantiles(qs)
+                for hour in sorted(hours, key=lambda h: int(h) if h.isdigit() else 99)}
+
+
+def update_price_sketches(as_data, lmp_data=None, path=SKETCH_FILE):
+    """Fold new days of A/S prices, hourly LMP and daily peak LMP into the store
+
+    as_data and lmp_data have the ancillary_services.json / caiso_prices.json
+    layout {date: {hour: {...}}}; lmp_data may be None to update A/S only.
+    Returns the loaded, updated store.
+    """
+    store = SketchStore.load(path)
+
+    as_days = {key: {} for key in AS_SERIES}
+    for date_str, hourly_as in as_data.items():
+        if not _is_date(date_str):
+            continue
+        for key in AS_SERIES:
+            as_days[key][date_str] = {}
+        for hour, values in hourly_as.items():
+            if not isinstance(values, dict):
+                continue
+            for key in AS_SERIES:
+                val = values.get(key.upper())
+                if val is not None:
+                    as_days[key][date_str][hour] = val
+    for key, days in as_days.items():
+        store.add_days(key, days)
+
+    lmp_days, peak_days = {}, {}
+    for date_str, hourly_lmp in (lmp_data or {}).items():
+        if not isinstance(hourly_lmp, dict) or not _is_date(date_str):
+            continue
+        hourly = {hour: vals["LMP"] for hour, vals in hourly_lmp.items()
+                  if isinstance(vals, dict) and vals.get("LMP") is not None}
+        lmp_days[date_str] = hourly
+        peak_days[date_str] = {"all": max(hourly.values())} if hourly else {}
+    store.add_days("lmp", lmp_days)
+    store.add_days("lmp_daily_peak", peak_days)
+
+    store.save()
+    return store
+
+
+def day_fingerprint(hourly_values):
+    """Short hash of one day's {hour: values}"""
+    items = sorted((str(hour), np.atleast_1d(values).astype(float).tolist())
+                   for hour, values in hourly_values.items())
+    return hashlib.sha1(json.dumps(items).encode()).hexdigest()[:12]
+
+
+def _is_date(date_str):
+    try:
+        datetime.strptime(date_str, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
@@ -0,0 +1,287 @@
+"""
+Multi-horizon net-load ramp engine
+
+Net load = load - solar - wind, from the 5-minute fuelsource history (load is
+gross load as in generate_seasonal_profiles.py: all generation minus battery
+charging). Ramps are net-load changes over each horizon in HORIZONS (5, 15,
+60 and 180 minutes). All horizons come from one sliding-window view of the
+net-load series: row i holds the last MAX_STEPS + 1 readings ending at
+interval i, so ramp[i, k] = window[i, -1] - window[i, -1 - steps[k]]. A ramp
+is only kept when its two readings are exactly that far apart in time and
+neither was masked by quality_scan.py (missing values or impossible jumps).
+
+Per day and horizon, ramp_daily.json stores:
+  - peak up / down ramp and the interval it ends on (the "3h" entry is the
+    daily maximum 3-hour ramp used for duck-curve timing)
+  - hour-of-day mean, max and min ramp plus sample counts (hour the ramp
+    ends in, 0-23), which combine into any seasonal / hour-of-day grouping
+
+Updates are incremental: only days whose file changed (and the day after
+them, whose first ramps reach back into the changed day) are recomputed,
+with the previous day's last MAX_STEPS intervals as context.
+
+Usage:
+    python ramp_engine.py             # update new/changed days
+    python ramp_engine.py --full      # recompute everything
+    python ramp_engine.py --dates 2026-03-01,2026-03-02   # only these new days
+    python ramp_engine.py --summary   # seasonal table of daily max 3-hour ramps
+
+From a chart script:
+    from ramp_engine import load_ramps, daily_peaks, hourly_profile
+    days = load_ramps()
+    dates, up, up_time, down, down_time = daily_peaks(days, "3h")
+    profile = hourly_profile(days, "1h", by="season")
+"""
+import os
+import sys
+import json
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from fuel_schema import (FUEL_INDEX, SEASONS, SEASON_OF_MONTH, SchemaRegistry, dates_arg,
+                         file_fingerprint, minutes_of_day, read_supply_days, supply_files)
+from quality_scan import interval_mask, load_flags
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+RAMP_FILE = os.path.join(script_dir, "ramp_daily.json")
+
+INTERVAL_MINUTES = 5
+# Horizon name -> number of 5-minute steps
+HORIZONS = {"5m": 1, "15m": 3, "1h": 12, "3h": 36}
+MAX_STEPS = max(HORIZONS.values())
+
+
+def net_load(values):
+    """Net load (MW) for an (n, fuels) array: gross load - solar - wind"""
+    mw = np.nan_to_num(values)
+    bat = mw[:, FUEL_INDEX["batteries"]]
+    load = mw.sum(axis=1) - np.minimum(bat, 0)
+    return load - mw[:, FUEL_INDEX["solar"]] - mw[:, FUEL_INDEX["wind"]]
+
+
+def compute_ramps(net, minutes, horizons=HORIZONS):
+    """(n, n_horizons) ramps in MW, NaN where the horizon spans a gap
+
+    net: net load per interval; minutes: absolute minute of each interval
+    (increasing). Rows before the first full window are NaN.
+    """
+    steps = np.array(list(horizons.values()))
+    window = steps.max() + 1
+    n = len(net)
+    ramps = np.full((n, len(steps)), np.nan)
+    if n < 2:
+        return ramps
+
+    # Pad the front so every interval has a full window (padding spans a gap)
+    pad = window - 1
+    net_w = sliding_window_view(np.concatenate([np.full(pad, np.nan), net]), window)
+    min_w = sliding_window_view(np.concatenate([np.full(pad, -10 ** 9), minutes]), window)
+    back = window - 1 - steps
+    ramps[:] = net_w[:, -1:] - net_w[:, back]
+    ramps[(min_w[:, -1:] - min_w[:, back]) != steps * INTERVAL_MINUTES] = np.nan
+    return ramps
+
+
+def _round_list(values, digits=1):
+    return [round(v, digits) if v == v else None for v in values.tolist()]
+
+
+def day_summary(times, hours, ramps):
+    """Per-horizon peaks and hour-of-day stats for one day's ramp rows"""
+    summary = {}
+    for k, name in enumerate(HORIZONS):
+        ramp = ramps[:, k]
+        valid = ~np.isnan(ramp)
+        if not valid.any():
+            continue
+        r, h = ramp[valid], hours[valid]
+        counts = np.bincount(h, minlength=24)
+        sums = np.bincount(h, weights=r, minlength=24)
+        hour_max = np.full(24, -np.inf)
+        hour_min = np.full(24, np.inf)
+        np.maximum.at(hour_max, h, r)
+        np.minimum.at(hour_min, h, r)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(counts > 0, sums / counts, np.nan)
+        hour_max[counts == 0] = np.nan
+        hour_min[counts == 0] = np.nan
+
+        i_up = int(np.nanargmax(ramp))
+        i_down = int(np.nanargmin(ramp))
+        summary[name] = {
+            "up": round(float(ramp[i_up]), 1),
+            "up_time": times[i_up],
+            "down": round(float(ramp[i_down]), 1),
+            "down_time": times[i_down],
+            "mean": _round_list(mean),
+            "max": _round_list(hour_max),
+            "min": _round_list(hour_min),
+            "n": counts.tolist(),
+        }
+    return summary
+
+
+def load_ramps(path=RAMP_FILE):
+    """{date: {"source": ..., horizon: {...}}} from ramp_daily.json"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def run(full=False, dates=None):
+    """Compute ramps for new/changed days and update the cache; returns days computed
+
+    dates: when given, only these days and days already in the cache are
+    considered (computed or used as context).
+    """
+    files = supply_files()
+    days_out = {} if full else load_ramps()
+    if dates is not None:
+        files = {d: p for d, p in files.items() if d in dates or d.isoformat() in days_out}
+    changed = {d for d, p in files.items()
+               if days_out.get(d.isoformat(), {}).get("source") != file_fingerprint(p)}
+    # A day's first ramps reach back into the previous day
+    todo = sorted(changed | {d + timedelta(days=1) for d in changed
+                             if d + timedelta(days=1) in files})
+    if not todo:
+        print(f"Ramps up to date ({len(days_out)} days)")
+        return 0
+
+    # Previous days are read as context only
+    todo_set = set(todo)
+    read_days = sorted(todo_set | {d - timedelta(days=1) for d in todo
+                                   if d - timedelta(days=1) in files})
+    registry = SchemaRegistry()
+    errors = {}
+    days = [(d, day) for d, day in read_supply_days(read_days, files, registry, "ramp days", errors)
+            if len(day.times)]
+    registry.save()
+    for d, message in errors.items():
+        if d in todo_set:
+            days_out[d.isoformat()] = {"source": file_fingerprint(files[d]), "error": message}
+    if not days:
+        print("No readable fuelsource files")
+        return 0
+
+    # Intervals flagged by quality_scan.py become NaN, so no ramp uses them
+    flags = load_flags()
+    net = np.concatenate([np.where(interval_mask(flags, d.isoformat(), day.times),
+                                   net_load(day.values), np.nan) for d, day in days])
+    minutes = np.concatenate([d.toordinal() * 1440 + minutes_of_day(day.times)
+                              for d, day in days])
+    ramps = compute_ramps(net, minutes)
+
+    offset = 0
+    for d, day in days:
+        n = len(day.times)
+        if d in todo_set:
+            hours = minutes_of_day(day.times) // 60 % 24
+            entry = {"source": file_fingerprint(files[d])}
+            entry.update(day_summary(day.times, hours, ramps[offset:offset + n]))
+            days_out[d.isoformat()] = entry
+        offset += n
+
+    days_out = dict(sorted(days_out.items()))
+    with open(RAMP_FILE, "w") as f:
+        json.dump(days_out, f, separators=(",", ":"))
+    print(f"Ramps computed for {len(todo)} days ({len(net):,} intervals, "
+          f"{len(HORIZONS)} horizons)")
+    return len(todo)
+
+
+# ── Queries over the cached days ──────────────────────────────────────────
+def _time_hours(time_strs):
+    """Decimal hours for HH:MM strings"""
+    return minutes_of_day(time_strs) / 60.0
+
+
+def daily_peaks(days, horizon="3h"):
+    """Arrays (dates, up, up_hour, down, down_hour) of each day's peak ramps
+
+    up_hour/down_hour are decimal hours of the interval the ramp ends on.
+    """
+    rows = [(d, e[horizon]) for d, e in days.items() if horizon in e]
+    dates = np.array([datetime.strptime(d, "%Y-%m-%d").date() for d, _ in rows])
+    up = np.array([e["up"] for _, e in rows], dtype=float)
+    down = np.array([e["down"] for _, e in rows], dtype=float)
+    up_hour = _time_hours([e["up_time"] for _, e in rows])
+    down_hour = _time_hours([e["down_time"] for _, e in rows])
+    return dates, up, up_hour, down, down_hour
+
+
+def _group_of(date_str, by):
+    if by == "season":
+        return SEASON_OF_MONTH[int(date_str[5:7])]
+    if by == "year":
+        return int(date_str[:4])
+    if by == "month":
+        return int(date_str[5:7])
+    return "all"
+
+
+def hourly_profile(days, horizon="1h", by="season", years=None):
+    """{group: {"mean", "max", "min", "n"}} hour-of-day ramp profiles
+
+    by: "season", "month", "year" or "all". Means are weighted by the sample
+    count of each day and hour; max/min are envelopes over the group.
+    """
+    acc = {}
+    for d, entry in days.items():
+        stats = entry.get(horizon)
+        if not stats or (years is not None and int(d[:4]) not in years):
+            continue
+        group = acc.setdefault(_group_of(d, by), [np.zeros(24), np.zeros(24),
+                                                  np.full(24, -np.inf), np.full(24, np.inf)])
+        n = np.array(stats["n"], dtype=float)
+        mean = np.array(stats["mean"], dtype=float)
+        group[0] += np.nan_to_num(mean) * n
+        group[1] += n
+        group[2] = np.fmax(group[2], np.array(stats["max"], dtype=float))
+        group[3] = np.fmin(group[3], np.array(stats["min"], dtype=float))
+
+    profiles = {}
+    for key, (sums, counts, hi, lo) in acc.items():
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(counts > 0, sums / counts, np.nan)
+        profiles[key] = {"mean": mean, "max": np.where(np.isfinite(hi), hi, np.nan),
+                         "min": np.where(np.isfinite(lo), lo, np.nan), "n": counts}
+    return profiles
+
+
+def print_summary(days):
+    """Seasonal mean daily max 3-hour up-ramp and its typical timing, by year"""
+    dates, up, up_hour, _, _ = daily_peaks(days, "3h")
+    if not len(dates):
+        print("No ramp data")
+        return
+    years = np.array([d.year for d in dates])
+    seasons = np.array([SEASON_OF_MONTH[d.month] for d in dates])
+    print("Daily max 3-hour net-load up-ramp (GW, mean) and median ending hour")
+    print("year  " + "".join(f"{s:>16s}" for s in SEASONS))
+    for year in np.unique(years):
+        cells = []
+        for season in SEASONS:
+            mask = (years == year) & (seasons == season)
+            if mask.any():
+                cells.append(f"{up[mask].mean() / 1000:7.1f} @ {np.median(up_hour[mask]):5.1f}h")
+            else:
+                cells.append("")
+        print(f"{year}  " + "".join(f"{c:>16s}" for c in cells))
+
+
+def main():
+    start = time.time()
+    if "--summary" in sys.argv:
+        print_summary(load_ramps())
+        return 0
+    run(full="--full" in sys.argv, dates=dates_arg(sys.argv))
+    print(f"Done in {time.time() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Tests for fetch_planner (window planning, response splitting, price merge, rate limiting)
+
+Usage:
+    python -m unittest test_fetch_planner
+"""
+import io
+import os
+import json
+import time
+import shutil
+import tempfile
+import zipfile
+import threading
+import unittest
+from datetime import date, timedelta
+
+from fetch_planner import (AS_REGION, DEFAULT_MARKET, TokenBucket, Window, merge_prices,
+                           oasis_params, plan_windows, run_windows, split_by_day)
+
+
+def items(days, product="lmp", market=DEFAULT_MARKET):
+    return {(d, market, product) for d in days}
+
+
+def zipped_csv(rows, name="PRC_LMP.csv"):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        text = "OPR_DT,OPR_HR,MW\n" + "".join(f"{d},{h},{mw}\n" for d, h, mw in rows)
+        archive.writestr(name, text)
+    return buf.getvalue()
+
+
+class PlanWindowsTest(unittest.TestCase):
+
+    def test_consecutive_days_form_one_window(self):
+        days = [date(2026, 3, 1) + timedelta(days=i) for i in range(5)]
+        self.assertEqual(plan_windows(items(days)),
+                         [Window("lmp", DEFAULT_MARKET, date(2026, 3, 1), date(2026, 3, 5))])
+
+    def test_small_gaps_are_bridged(self):
+        days = [date(2026, 3, 1), date(2026, 3, 4), date(2026, 3, 8)]
+        # 2-day gap bridged, 3-day gap splits
+        self.assertEqual(plan_windows(items(days), max_gap_days=2),
+                         [Window("lmp", DEFAULT_MARKET, date(2026, 3, 1), date(2026, 3, 4)),
+                          Window("lmp", DEFAULT_MARKET, date(2026, 3, 8), date(2026, 3, 8))])
+
+    def test_windows_are_capped(self):
+        days = [date(2026, 1, 1) + timedelta(days=i) for i in range(70)]
+        windows = plan_windows(items(days), max_days=31)
+        self.assertEqual([(w.end - w.start).days + 1 for w in windows], [31, 31, 8])
+        self.assertEqual(windows[-1].end, days[-1])
+
+    def test_series_are_planned_separately(self):
+        day = date(2026, 3, 1)
+        windows = plan_windows(items([day], "lmp") | items([day], "as")
+                               | items([day], "lmp", "RTM"))
+        self.assertEqual(sorted((w.product, w.market) for w in windows),
+                         [("as", DEFAULT_MARKET), ("lmp", DEFAULT_MARKET), ("lmp", "RTM")])
+
+    def test_empty(self):
+        self.assertEqual(plan_windows(set()), [])
+
+    def test_params_span_local_days(self):
+        # DST starts 2026-03-08: the window ends at 07:00 GMT, not 08:00
+        params = oasis_params(Window("lmp", "DAM", date(2026, 3, 1), date(2026, 3, 8)))
+        self.assertEqual(params["startdatetime"], "20260301T08:00-0000")
+        self.assertEqual(params["enddatetime"], "20260309T07:00-0000")
+        self.assertEqual(params["queryname"], "PRC_LMP")
+
+
+class SplitByDayTest(unittest.TestCase):
+
+    def test_rows_grouped_by_operating_date(self):
+        payload = zipped_csv([("2026-03-01", 1, 10), ("2026-03-01", 2, 11),
+                              ("2026-03-02", 1, 12)])
+        days = split_by_day(payload)
+        self.assertEqual(sorted(days), [date(2026, 3, 1), date(2026, 3, 2)])
+        self.assertEqual([row["MW"] for row in days[date(2026, 3, 1)]], ["10", "11"])
+
+    def test_non_csv_members_ignored(self):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as archive:
+            archive.writestr("readme.xml", "<x/>")
+        self.assertEqual(split_by_day(buf.getvalue()), {})
+
+    def test_run_windows_drops_bridged_days(self):
+        wanted = items([date(2026, 3, 1), date(2026, 3, 3)])
+        windows = plan_windows(wanted)
+        self.assertEqual(len(windows), 1)
+
+        def fetch(params):
+            return zipped_csv([("2026-03-01", 1, 1), ("2026-03-02", 1, 2),
+                               ("2026-03-03", 1, 3), ("2026-03-04", 1, 4)])
+
+        results, failures = run_windows(windows, wanted=wanted, fetch=fetch,
+                                        bucket=TokenBucket(rate=1000, burst=10))
+        self.assertEqual(failures, [])
+        self.assertEqual(sorted(results[("lmp", DEFAULT_MARKET)]),
+                         [date(2026, 3, 1), date(2026, 3, 3)])
+
+    def test_failed_window_does_not_abort_run(self):
+        wanted = items([date(2026, 3, 1), date(2026, 3, 20)])
+        windows = plan_windows(wanted)
+        self.assertEqual(len(windows), 2)
+
+        def fetch(params):
+            if params["startdatetime"].startswith("20260320"):
+                raise RuntimeError("HTTP 429")
+            return zipped_csv([("2026-03-01", 1, 1)])
+
+        results, failures = run_windows(windows, wanted=wanted, fetch=fetch,
+                                        bucket=TokenBucket(rate=1000, burst=10))
+        self.assertEqual(list(results[("lmp", DEFAULT_MARKET)]), [date(2026, 3, 1)])
+        self.assertEqual([(w.start, message) for w, message in failures],
+                         [(date(2026, 3, 20), "HTTP 429")])
+
+
+class MergePricesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.files = {"lmp": os.path.join(self.root, "caiso_prices.json"),
+                      "as": os.path.join(self.root, "ancillary_services.json")}
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def load(self, product):
+        with open(self.files[product]) as f:
+            return json.load(f)
+
+    def test_lmp_components_merged_into_existing_days(self):
+        with open(self.files["lmp"], "w") as f:
+            json.dump({"2026-02-28": {"1": {"LMP": 30.0}},
+                       "2026-03-01": {"2": {"LMP": 31.0}}}, f)
+        rows = [{"OPR_HR": "1", "LMP_TYPE": "LMP", "MW": "40.5"},
+                {"OPR_HR": "1", "LMP_TYPE": "MCE", "MW": "38.0"},
+                {"OPR_HR": "24", "LMP_TYPE": "MCL", "MW": "-0.5"},
+                {"OPR_HR": "1", "LMP_TYPE": "XYZ", "MW": "9"}]
+        merged = merge_prices({("lmp", DEFAULT_MARKET): {date(2026, 3, 1): rows}}, self.files)
+        self.assertEqual(merged, 1)
+        self.assertEqual(self.load("lmp"), {
+            "2026-02-28": {"1": {"LMP": 30.0}},
+            "2026-03-01": {"1": {"LMP": 40.5, "MEC": 38.0}, "2": {"LMP": 31.0},
+                           "24": {"LOSS": -0.5}}})
+        self.assertFalse(os.path.exists(self.files["as"]))
+
+    def test_as_prices_filtered_to_region(self):
+        rows = [{"OPR_HR": "3", "ANC_TYPE": "RU", "ANC_REGION": AS_REGION, "MW": "5"},
+                {"OPR_HR": "3", "ANC_TYPE": "RU", "ANC_REGION": "AS_SP26_EXP", "MW": "7"},
+                {"OPR_HR": "3", "ANC_TYPE": "SR", "ANC_REGION": AS_REGION, "MW": ""}]
+        merge_prices({("as", DEFAULT_MARKET): {date(2026, 3, 1): rows}}, self.files)
+        self.assertEqual(self.load("as"), {"2026-03-01": {"3": {"RU": 5.0}}})
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_burst_is_immediate(self):
+        bucket = TokenBucket(rate=1, burst=3)
+        start = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        self.assertLess(time.monotonic() - start, 0.1)
+
+    def test_rate_limits_after_burst(self):
+        bucket = TokenBucket(rate=20, burst=1)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        # 1 from the burst, then 4 at 20/s
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_shared_across_threads(self):
+        bucket = TokenBucket(rate=50, burst=2)
+        start = time.monotonic()
+        threads = [threading.Thread(target=bucket.acquire) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 2 from the burst, then 10 at 50/s
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+"""
+Tests for oasis_cache against a local stub OASIS server
+
+Usage:
+    python -m unittest test_oasis_cache
+"""
+import io
+import time
+import shutil
+import hashlib
+import zipfile
+import tempfile
+import threading
+import unittest
+import urllib.parse
+import http.server
+from datetime import datetime, timedelta
+
+import oasis_cache
+from oasis_cache import OasisCache, OasisError, cache_key
+
+ERROR_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<m:OASISReport xmlns:m="http://www.caiso.com/soa/OASISReport_v1.xsd">'
+    "<m:MessagePayload><m:RTO><m:name>CAISO</m:name><m:ERROR>"
+    "<m:ERR_CODE>1000</m:ERR_CODE>"
+    "<m:ERR_DESC>No data returned for the specified selection</m:ERR_DESC>"
+    "</m:ERROR></m:RTO></m:MessagePayload></m:OASISReport>"
+)
+
+
+def zipped(name, text):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        archive.writestr(name, text)
+    return buf.getvalue()
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """Zipped CSV per query; queryname=ERROR returns an error document, BADZIP plain text"""
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(self.path).query))
+        if query.get("queryname") == "ERROR":
+            body = zipped("INVALID_REQUEST.xml", ERROR_XML)
+        elif query.get("queryname") == "BADZIP":
+            body = b"Service unavailable"
+        else:
+            body = zipped("data.csv", f"OPR_DT,VALUE\n{query.get('startdatetime', '')[:8]},"
+                                      f"{server.version}\n")
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def params(queryname, end):
+    start = end - timedelta(days=1)
+    return {"queryname": queryname, "market_run_id": "DAM",
+            "startdatetime": start.strftime("%Y%m%dT08:00-0000"),
+            "enddatetime": end.strftime("%Y%m%dT08:00-0000")}
+
+
+class OasisCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        cls.server.requests = 0
+        cls.server.version = 1
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}/oasisapi/SingleZip"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = OasisCache(root=self.root, base_url=self.base_url)
+        self.server.requests = 0
+        self.server.version = 1
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_miss_then_hit(self):
+        query = params("PRC_LMP", datetime.now().date())
+        first = self.cache.get(query)
+        second = self.cache.get(query)
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual((self.cache.misses, self.cache.hits), (1, 1))
+
+    def test_index_survives_reload(self):
+        query = params("PRC_LMP", datetime.now().date())
+        payload = self.cache.get(query)
+        self.cache.save()
+        reloaded = OasisCache(root=self.root, base_url=self.base_url)
+        self.assertEqual(reloaded.get(query), payload)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_error_payload_raises_and_is_not_cached(self):
+        query = params("ERROR", datetime.now().date())
+        with self.assertRaisesRegex(OasisError, "1000: No data returned"):
+            self.cache.get(query)
+        self.assertNotIn(cache_key(query), self.cache.index)
+        with self.assertRaises(OasisError):
+            self.cache.get(query)
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(self.cache.errors, 2)
+
+    def test_non_zip_payload_raises(self):
+        with self.assertRaisesRegex(OasisError, "not a zip"):
+            self.cache.get(params("BADZIP", datetime.now().date()))
+        self.assertEqual(self.cache.index, {})
+
+    def test_settled_window_is_never_refetched(self):
+        query = params("PRC_LMP", datetime.now().date() - timedelta(days=30))
+        payload = self.cache.get(query)
+        entry = self.cache.index[cache_key(query)]
+        self.assertTrue(entry["settled"])
+
+        # Long past the recent TTL, and the server's answer has changed
+        entry["fetched_at"] -= 10 * oasis_cache.RECENT_TTL_HOURS * 3600
+        self.server.version = 2
+        self.assertEqual(self.cache.get(query), payload)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_recent_window_is_revalidated(self):
+        query = params("PRC_LMP", datetime.now().date())
+        payload = self.cache.get(query)
+        entry = self.cache.index[cache_key(query)]
+        self.assertFalse(entry["settled"])
+
+        # Expired but unchanged: 304, the cached payload is kept
+        entry["fetched_at"] = time.time() - 2 * oasis_cache.RECENT_TTL_HOURS * 3600
+        self.assertEqual(self.cache.get(query), payload)
+        self.assertEqual(self.cache.revalidated, 1)
+
+        # Expired and corrected upstream: the new payload replaces it
+        entry["fetched_at"] = time.time() - 2 * oasis_cache.RECENT_TTL_HOURS * 3600
+        self.server.version = 2
+        updated = self.cache.get(query)
+        self.assertNotEqual(updated, payload)
+        self.assertEqual(self.cache.get(query), updated)
+        self.assertEqual(self.server.requests, 3)
+
+    def test_default_cache_created_once_across_threads(self):
+        created = []
+        root, base_url = self.root, self.base_url
+
+        class CountingCache(OasisCache):
+            def __init__(self):
+                created.append(self)
+                time.sleep(0.05)  # widen the window for a racing second thread
+                super().__init__(root=root, base_url=base_url)
+
+        saved = oasis_cache.OasisCache, oasis_cache._default
+        oasis_cache.OasisCache, oasis_cache._default = CountingCache, None
+        try:
+            threads = [threading.Thread(target=oasis_cache.default_cache) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            oasis_cache.OasisCache, oasis_cache._default = saved
+        self.assertEqual(len(created), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
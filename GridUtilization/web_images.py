@@ -0,0 +1,224 @@
+"""
+Optimized web variants of the generated charts
+
+The charts are rendered at dpi=200 as full-colour PNG (1.5-2 MB each). For the
+charts shown in PAGES, this post-render stage writes, per chart, into web/:
+
+  - <name>.png          palette-quantized PNG at the largest width (fallback)
+  - <name>-<w>.webp     WebP at each of WIDTHS
+  - <name>-<w>.avif     AVIF at each of WIDTHS (if Pillow has AVIF support)
+
+and rewrites the chart <img> tags of PAGES into <picture> elements with
+srcset/sizes, so browsers pick the smallest suitable file.
+
+Images are converted in parallel (one process per chart). A chart is skipped
+when its source hash matches web/manifest.txt and all of its outputs exist.
+Charts the pages do not show are left alone, and published_charts() (the
+charts the pages serve from web/) is what daily_update and the workflow keep
+out of commits.
+
+Usage:
+    python web_images.py              # convert changed charts, update pages
+    python web_images.py --force      # reconvert everything
+    python web_images.py --published  # list the originals served from web/
+"""
+import os
+import re
+import sys
+import glob
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, features
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+WEB_DIR = os.path.join(script_dir, "web")
+MANIFEST_FILE = os.path.join(WEB_DIR, "manifest.txt")
+PAGES = [os.path.join(script_dir, "california_clean_energy_progress.html")]
+
+WIDTHS = (720, 1440, 2160)
+# Chart containers are 100% wide up to the 1400px page width minus padding
+SIZES = "(max-width: 1400px) 100vw, 1340px"
+PALETTE_COLORS = 256
+WEBP_QUALITY = 82
+AVIF_QUALITY = 60
+HAS_AVIF = features.check("avif")
+
+
+def source_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def output_names(name, width):
+    """Relative (to script_dir) output paths of one chart"""
+    names = [f"web/{name}.png"]
+    for w in widths_for(width):
+        names.append(f"web/{name}-{w}.webp")
+        if HAS_AVIF:
+            names.append(f"web/{name}-{w}.avif")
+    return names
+
+
+def widths_for(width):
+    """WIDTHS no wider than the source, always at least one"""
+    return [w for w in WIDTHS if w <= width] or [width]
+
+
+def convert(path):
+    """Write all web variants of one chart; returns (name, width, largest WebP bytes)"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    with Image.open(path) as src:
+        img = src.convert("RGB")
+    widths = widths_for(img.width)
+
+    for w in widths:
+        h = round(img.height * w / img.width)
+        resized = img if w == img.width else img.resize((w, h), Image.LANCZOS)
+        out = os.path.join(WEB_DIR, f"{name}-{w}.webp")
+        resized.save(out, "WEBP", quality=WEBP_QUALITY, method=6)
+        largest = os.path.getsize(out)
+        if HAS_AVIF:
+            out = os.path.join(WEB_DIR, f"{name}-{w}.avif")
+            resized.save(out, "AVIF", quality=AVIF_QUALITY)
+        if w == widths[-1]:
+            out = os.path.join(WEB_DIR, f"{name}.png")
+            resized.quantize(PALETTE_COLORS, method=Image.Quantize.MEDIANCUT,
+                             dither=Image.Dither.NONE).save(out, optimize=True)
+    return name, img.width, largest
+
+
+def load_manifest():
+    """{name: (hash, width)}"""
+    manifest = {}
+    if os.path.exists(MANIFEST_FILE):
+        with open(MANIFEST_FILE) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3:
+                    manifest[parts[0]] = (parts[1], int(parts[2]))
+    return manifest
+
+
+def save_manifest(manifest):
+    with open(MANIFEST_FILE, "w") as f:
+        for name in sorted(manifest):
+            f.write(f"{name} {manifest[name][0]} {manifest[name][1]}\n")
+
+
+def picture_tag(name, width, alt, indent):
+    """<picture> element for one chart"""
+    widths = widths_for(width)
+    lines = [f'<picture data-chart="{name}">']
+    formats = (("avif", "image/avif"), ("webp", "image/webp")) if HAS_AVIF else (("webp", "image/webp"),)
+    for ext, mime in formats:
+        srcset = ", ".join(f"web/{name}-{w}.{ext} {w}w" for w in widths)
+        lines.append(f'    <source type="{mime}" srcset="{srcset}" sizes="{SIZES}">')
+    lines.append(f'    <img src="web/{name}.png" alt="{alt}" loading="lazy">')
+    lines.append("</picture>")
+    return ("\n" + indent).join(lines)
+
+
+IMG_RE = re.compile(r'(?P<indent>[ \t]*)<img src="(?P<name>[\w-]+)\.png" alt="(?P<alt>[^"]*)">')
+PICTURE_RE = re.compile(
+    r'(?P<indent>[ \t]*)<picture data-chart="(?P<name>[\w-]+)">.*?'
+    r'<img src="web/[\w-]+\.png" alt="(?P<alt>[^"]*)"[^>]*>\s*</picture>', re.S)
+
+
+def _page_matches(pattern):
+    names = set()
+    for page in PAGES:
+        if os.path.exists(page):
+            with open(page, encoding="utf-8") as f:
+                names.update(m.group("name") for m in pattern.finditer(f.read()))
+    return names
+
+
+def page_charts():
+    """Names of the charts PAGES show, as plain <img> or already as <picture>"""
+    return _page_matches(IMG_RE) | _page_matches(PICTURE_RE)
+
+
+def published_charts():
+    """Names of the charts PAGES serve from web/; their originals are not committed"""
+    return sorted(_page_matches(PICTURE_RE))
+
+
+def update_page(page, manifest):
+    """Point chart images in page at the web variants; returns True if changed"""
+    with open(page, encoding="utf-8") as f:
+        html = f.read()
+
+    def replace(match):
+        name = match.group("name")
+        if name not in manifest:
+            return match.group(0)
+        indent = match.group("indent")
+        return indent + picture_tag(name, manifest[name][1], match.group("alt"), indent)
+
+    updated = PICTURE_RE.sub(replace, IMG_RE.sub(replace, html))
+    if updated == html:
+        return False
+    with open(page, "w", encoding="utf-8", newline="") as f:
+        f.write(updated)
+    return True
+
+
+def main():
+    if "--published" in sys.argv:
+        for name in published_charts():
+            print(f"{name}.png")
+        return 0
+
+    force = "--force" in sys.argv
+    os.makedirs(WEB_DIR, exist_ok=True)
+    manifest = load_manifest()
+    shown = page_charts()
+
+    # Variants of charts no longer shown would only be committed dead weight
+    dropped = sorted(set(manifest) - shown)
+    for name in dropped:
+        for rel in output_names(name, manifest.pop(name)[1]):
+            if os.path.exists(os.path.join(script_dir, rel)):
+                os.remove(os.path.join(script_dir, rel))
+    if dropped:
+        print(f"Removed web variants of {len(dropped)} chart(s) not shown on the pages")
+
+    todo = []
+    for path in sorted(glob.glob(os.path.join(script_dir, "*.png"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name not in shown:
+            continue
+        digest = source_hash(path)
+        entry = manifest.get(name)
+        if (not force and entry and entry[0] == digest and
+                all(os.path.exists(os.path.join(script_dir, p))
+                    for p in output_names(name, entry[1]))):
+            continue
+        todo.append((path, name, digest))
+
+    print(f"{len(todo)} chart(s) to convert")
+    if not HAS_AVIF:
+        print("  Pillow has no AVIF support, writing WebP only")
+
+    if todo:
+        with ProcessPoolExecutor() as pool:
+            results = pool.map(convert, [path for path, _, _ in todo])
+            for (path, _, digest), (name, width, largest) in zip(todo, results):
+                manifest[name] = (digest, width)
+                print(f"  {name}: {os.path.getsize(path) / 1e6:.1f} MB PNG -> "
+                      f"{largest / 1e3:.0f} KB WebP at {widths_for(width)[-1]}px")
+    if todo or dropped:
+        save_manifest(manifest)
+
+    for page in PAGES:
+        if os.path.exists(page) and update_page(page, manifest):
+            print(f"  Updated image tags in {os.path.basename(page)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
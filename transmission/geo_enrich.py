@@ -0,0 +1,210 @@
+"""
+Spatial joins and compact LMP price sidecar for the transmission map
+
+The substation geometry (substations.geojson) is static. Instead of
+rewriting the full geometry every day just to attach new prices, this module:
+
+  1. Builds a uniform grid spatial index over the pricing nodes, so each
+     substation joins to its nearest node.
+  2. Writes substation_prices.json: a small columnar sidecar keyed by
+     substation OBJECTID. Identical 24-hour price vectors are stored once and
+     referenced by index.
+
+index.html loads the static geometry (cacheable) plus the sidecar, and falls
+back to substations_with_prices.geojson while no sidecar exists.
+
+Price input, in order of preference:
+  - node_prices.json: {"date": ..., "nodes": [{"node", "lon", "lat",
+    "LMP_Total_24h": [...], ...}]}. Each substation takes the prices of its
+    nearest pricing node.
+  - substations_with_prices.geojson (legacy enriched file): prices are
+    lifted out of the feature properties.
+
+Usage:
+    python geo_enrich.py
+"""
+import os
+import sys
+import json
+import math
+from datetime import date
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+SUBSTATIONS_FILE = os.path.join(script_dir, "substations.geojson")
+NODE_PRICES_FILE = os.path.join(script_dir, "node_prices.json")
+LEGACY_PRICES_FILE = os.path.join(script_dir, "substations_with_prices.geojson")
+SIDECAR_FILE = os.path.join(script_dir, "substation_prices.json")
+
+PRICE_FIELDS = ["LMP_Total", "LMP_Energy", "LMP_Congestion", "LMP_Loss", "LMP_GHG"]
+CELL_DEGREES = 0.25
+# Substations farther than this from any pricing node get no price
+MAX_NODE_DISTANCE_KM = 50.0
+
+
+class GridIndex:
+    """Uniform lon/lat grid for nearest-point queries
+
+    Distances are equirectangular (longitude scaled by cos(latitude)), which
+    is accurate to well under 1% at California scales.
+    """
+
+    def __init__(self, points, cell=CELL_DEGREES):
+        self.points = points  # [(lon, lat)]
+        self.cell = cell
+        self.cells = {}
+        for i, (lon, lat) in enumerate(points):
+            self.cells.setdefault(self._key(lon, lat), []).append(i)
+        keys = list(self.cells)
+        self.bounds = (min(k[0] for k in keys), max(k[0] for k in keys),
+                       min(k[1] for k in keys), max(k[1] for k in keys)) if keys else None
+
+    def _key(self, lon, lat):
+        return (int(math.floor(lon / self.cell)), int(math.floor(lat / self.cell)))
+
+    def nearest(self, lon, lat, max_km=None):
+        """(index, distance_km) of the nearest point, or (None, None)"""
+        if not self.points:
+            return None, None
+        cx, cy = self._key(lon, lat)
+        km_per_cell = self.cell * 111.0 * min(1.0, math.cos(math.radians(lat)))
+        best, best_d = None, math.inf
+        ring = 0
+        min_x, max_x, min_y, max_y = self.bounds
+        max_ring = max(abs(min_x - cx), abs(max_x - cx), abs(min_y - cy), abs(max_y - cy))
+        while ring <= max_ring:
+            for gx in range(cx - ring, cx + ring + 1):
+                for gy in range(cy - ring, cy + ring + 1):
+                    if max(abs(gx - cx), abs(gy - cy)) != ring:
+                        continue  # Only the new outer ring
+                    for i in self.cells.get((gx, gy), ()):
+                        d = distance_km(lon, lat, *self.points[i])
+                        if d < best_d:
+                            best, best_d = i, d
+            # Anything in further rings is at least ring * cell away
+            if best is not None and best_d <= ring * km_per_cell:
+                break
+            if max_km is not None and ring * km_per_cell > max_km:
+                break
+            ring += 1
+        if best is None or (max_km is not None and best_d > max_km):
+            return None, None
+        return best, best_d
+
+
+def distance_km(lon1, lat1, lon2, lat2):
+    """Equirectangular distance in km"""
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return 6371.0 * math.hypot(x, y)
+
+
+def load_points(path, id_key="OBJECTID"):
+    """([ids], [(lon, lat)]) for the Point features of a GeoJSON file"""
+    with open(path) as f:
+        data = json.load(f)
+    ids, coords = [], []
+    for feature in data.get("features", []):
+        geometry = feature.get("geometry") or {}
+        xy = geometry.get("coordinates")
+        if geometry.get("type") != "Point" or not xy or len(xy) < 2:
+            continue
+        props = feature.get("properties") or {}
+        ids.append(props.get(id_key, feature.get("id")))
+        coords.append((float(xy[0]), float(xy[1])))
+    return ids, coords
+
+
+def _price_vector(props):
+    """Tuple of rounded 24-hour arrays for PRICE_FIELDS (None if no prices)"""
+    vector = []
+    found = False
+    for field in PRICE_FIELDS:
+        hourly = props.get(field + "_24h")
+        if isinstance(hourly, list):
+            values = tuple(None if v is None else round(v, 2) for v in hourly)
+        elif props.get(field) is not None:
+            values = (round(props[field], 2),)
+        else:
+            values = ()
+        found = found or any(v is not None for v in values)
+        vector.append(values)
+    return tuple(vector) if found else None
+
+
+def prices_from_nodes(node_data):
+    """{substation id: price vector} via nearest pricing node"""
+    sub_ids, sub_coords = load_points(SUBSTATIONS_FILE)
+    nodes = [n for n in node_data.get("nodes", [])
+             if n.get("lon") is not None and n.get("lat") is not None]
+    index = GridIndex([(float(n["lon"]), float(n["lat"])) for n in nodes])
+    vectors = [_price_vector(n) for n in nodes]
+
+    prices = {}
+    for sub_id, (lon, lat) in zip(sub_ids, sub_coords):
+        i, _ = index.nearest(lon, lat, max_km=MAX_NODE_DISTANCE_KM)
+        if i is not None and vectors[i] is not None:
+            prices[sub_id] = vectors[i]
+    return prices
+
+
+def prices_from_legacy(path=LEGACY_PRICES_FILE):
+    """{substation id: price vector} lifted out of an enriched GeoJSON"""
+    with open(path) as f:
+        data = json.load(f)
+    prices = {}
+    for feature in data.get("features", []):
+        props = feature.get("properties") or {}
+        vector = _price_vector(props)
+        if vector is not None:
+            prices[props.get("OBJECTID", feature.get("id"))] = vector
+    return prices
+
+
+def write_sidecar(prices, price_date):
+    """Write the columnar sidecar; identical price vectors are stored once"""
+    table, lookup = [], {}
+    ids, refs = [], []
+    for sub_id in sorted(prices):
+        vector = prices[sub_id]
+        if vector not in lookup:
+            lookup[vector] = len(table)
+            table.append(vector)
+        ids.append(sub_id)
+        refs.append(lookup[vector])
+
+    sidecar = {
+        "date": price_date,
+        "fields": PRICE_FIELDS,
+        "ids": ids,
+        "price_index": refs,
+        # prices[k][f] = 24-hour array (or single value) of PRICE_FIELDS[f]
+        "prices": [[list(values) for values in vector] for vector in table],
+    }
+    with open(SIDECAR_FILE, "w") as f:
+        json.dump(sidecar, f, separators=(",", ":"))
+    print(f"Wrote price sidecar: {len(ids)} substations, {len(table)} distinct price vectors, "
+          f"{os.path.getsize(SIDECAR_FILE) / 1024:.0f} KB")
+
+
+def main():
+    if os.path.exists(NODE_PRICES_FILE):
+        with open(NODE_PRICES_FILE) as f:
+            node_data = json.load(f)
+        prices = prices_from_nodes(node_data)
+        price_date = node_data.get("date", date.today().isoformat())
+    elif os.path.exists(LEGACY_PRICES_FILE):
+        prices = prices_from_legacy()
+        price_date = date.fromtimestamp(os.path.getmtime(LEGACY_PRICES_FILE)).isoformat()
+    else:
+        print("No price input found (node_prices.json or substations_with_prices.geojson)")
+        return 1
+
+    if not prices:
+        print("No substation prices to write")
+        return 1
+    write_sidecar(prices, price_date)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,6 +19,15 @@ if %PYERR% NEQ 0 (
     goto :done
 )
 
+echo.
+echo [PYTHON] Writing compact price sidecar...
+python geo_enrich.py
+if %ERRORLEVEL% NEQ 0 (
+    echo.
+    echo [ERROR] Failed to write price sidecar.
+    goto :done
+)
+
 echo.
 echo [SUCCESS] Prices updated.
 
@@ -38,7 +47,7 @@ REM Reset HEAD to match remote (keeps working tree untouched)
 git reset origin/simbooni
 
 echo [GIT] Committing changes...
-git add -f substations_with_prices.geojson
+git add substation_prices.json
 git commit -m "Auto-update LMP prices for %date%"
 set COMMITERR=%ERRORLEVEL%
 